@@ -0,0 +1,133 @@
+"""
+可合并的分位数草图公共模块
+
+供 计算实际时长-均值-置信度.py 使用。按 t-digest 的思路把一组时长压缩为
+约 compression/2 个质心（均值、权重），两端分位附近的质心更小，p80/p90/p95
+等尾部分位数误差很小；值不多的分组每个值单独成为质心，结果与精确分位数一致。
+不同文件、不同季度的草图可直接合并，全年分位数不必重新读取全部明细。
+"""
+
+import pickle
+
+import numpy as np
+
+# 压缩参数：越大质心越多、越精确
+DEFAULT_COMPRESSION = 200
+
+
+def _scale(q, compression):
+    """k1 尺度函数，相邻质心的 k 值之差不超过1"""
+    return compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+
+class QuantileSketch:
+    """
+    分位数草图，同时保存计数、合计、平方和、最小值、最大值，可得到精确的均值和标准差
+    :param compression: 压缩参数
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.array([], dtype=float)
+        self.weights = np.array([], dtype=float)
+        self.count = 0
+        self.total = 0.0
+        self.square_total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        return cls(compression).update(values)
+
+    def update(self, values):
+        """加入一批值（空值忽略），返回自身"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.total += values.sum()
+        self.square_total += (values ** 2).sum()
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        """并入另一个草图，返回自身"""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.square_total += other.square_total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        # 按值排序后 k 值单调，落在同一整数区间内的相邻质心合并为一个
+        clusters = np.floor(_scale(q, self.compression))
+        starts = np.flatnonzero(np.r_[True, clusters[1:] != clusters[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """
+        估计分位数，口径与 Series.quantile 的线性插值一致
+        :param q: 单个分位数或分位数列表
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        # 质心中心所在的秩（从0开始），两端用最小值、最大值
+        centers = np.cumsum(self.weights) - (self.weights + 1) / 2
+        return np.interp(np.asarray(q) * (self.count - 1),
+                         np.r_[0, centers, self.count - 1],
+                         np.r_[self.min, self.means, self.max])
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        """样本标准差，不足2个值时为 NaN"""
+        if self.count < 2:
+            return np.nan
+        variance = (self.square_total - self.total ** 2 / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+
+def build_group_sketches(df, value_column, group_columns, compression=DEFAULT_COMPRESSION):
+    """按分组生成草图，返回 {分组键元组: QuantileSketch}"""
+    return {
+        key: QuantileSketch.from_values(values.to_numpy(dtype=float), compression)
+        for key, values in df.groupby(group_columns)[value_column]
+    }
+
+
+def merge_sketch_sets(sketch_sets, compression=DEFAULT_COMPRESSION):
+    """合并多份分组草图（如各季度），同一分组的草图合并，输入不被修改"""
+    merged = {}
+    for sketches in sketch_sets:
+        for key, sketch in sketches.items():
+            merged.setdefault(key, QuantileSketch(compression)).merge(sketch)
+    return merged
+
+
+def save_sketches(sketches, file_path):
+    with open(file_path, 'wb') as f:
+        pickle.dump(sketches, f)
+
+
+def load_sketches(file_path):
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# 被测模块与测试不在同一目录，按脚本的方式直接导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import 审批计算
+from 生成测试数据 import generate_approval_workbook
+
+
+@pytest.fixture
+def approval_workbook(tmp_path, monkeypatch):
+    """生成一份小规模审批测试数据，附表缓存写到临时目录"""
+    monkeypatch.setattr(审批计算, 'REFERENCE_CACHE_DIR', str(tmp_path / '缓存'))
+    return generate_approval_workbook(600, str(tmp_path / '审批数据.xlsx'), seed=1)
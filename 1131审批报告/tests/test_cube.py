@@ -0,0 +1,25 @@
+import pandas as pd
+
+import 审批计算
+
+
+def test_slice_from_saved_cube_matches_detail_rows(approval_workbook, tmp_path):
+    """由保存的立方体上卷出的 体系×季度 报告与直接按明细分组计算的结果一致"""
+    result = 审批计算.process_approval_data(approval_workbook)
+    cube_path = 审批计算.cube_path_for(str(tmp_path / '审批结果.xlsx'))
+    审批计算.save_cube(result['cube'], cube_path)
+
+    dimensions = ['审批人所在体系', 审批计算.QUARTER_COLUMN]
+    report = 审批计算.cube_report(cube_path, dimensions).set_index(dimensions)
+
+    detail = result['merged_data'].assign(**{审批计算.QUARTER_COLUMN: 审批计算.quarter_of(result['merged_data'])})
+    groups = detail.groupby(dimensions)
+    expected = pd.DataFrame({
+        'A-审批总次数': groups['流程名称'].count(),
+        '时效≤1的节点数': groups['节点审批时效情况：≤1；1<X≤2；2<X≤3；>3'].apply(lambda x: (x == '≤1').sum()),
+        '平均工作时长（天）': groups['该节点审批工作时长'].mean(),
+        '工作时长标准差（天）': groups['该节点审批工作时长'].std(),
+        '记录数': groups.size(),
+    }).round(2)
+
+    pd.testing.assert_frame_equal(report[expected.columns], expected, check_dtype=False, check_names=False)
@@ -0,0 +1,50 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import build_group_sketches, save_sketches
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '计算实际时长-均值-置信度.py')
+# 合并后 p80/p90/p95 与精确分位数的相对误差上限
+MAX_RELATIVE_ERROR = 0.01
+
+
+def load_script():
+    """脚本文件名不是合法模块名，按路径导入"""
+    spec = importlib.util.spec_from_file_location('duration_analysis', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def quarter_frame(rng, n_rows, scale):
+    """一个季度的模拟明细：两个流程、三个节点，工作时长为长尾分布"""
+    return pd.DataFrame({
+        '流程名称': rng.choice(['流程A', '流程B'], n_rows),
+        '审批节点名称': rng.choice(['节点1', '节点2', '节点3'], n_rows),
+        '该节点审批工作时长': rng.lognormal(np.log(scale), 0.9, n_rows),
+    })
+
+
+def test_merged_quarter_sketches_match_exact_tail_quantiles(tmp_path):
+    """各季度草图合并后的全年 p80/p90/p95 与全年明细的精确分位数误差在1%以内"""
+    script = load_script()
+    rng = np.random.default_rng(0)
+    quarters = [quarter_frame(rng, 20000, scale) for scale in (0.5, 0.8, 1.2, 2.0)]
+
+    paths = []
+    for i, quarter in enumerate(quarters):
+        path = str(tmp_path / f'Q{i + 1}{script.SKETCH_SUFFIX}')
+        save_sketches(build_group_sketches(quarter, '该节点审批工作时长', ['流程名称', '审批节点名称']), path)
+        paths.append(path)
+
+    merged = script.merge_quarter_sketches(paths)
+    exact = script.analyze_approval_duration(pd.concat(quarters, ignore_index=True), '流程名称', '审批节点名称')
+
+    assert (merged['count'].to_numpy() == exact['count'].to_numpy()).all()
+    for q in script.QUANTILES:
+        column = f'{q:.0%}分位'
+        relative_error = np.abs(merged[column] - exact[column]) / exact[column]
+        assert relative_error.max() < MAX_RELATIVE_ERROR, column
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+import 审批计算
+from 审批流监控 import MONITOR_METRICS, SlaMonitor
+
+# 批量明细中没有 是否超时 列，比较其余指标
+METRICS = [metric for metric in MONITOR_METRICS if '超时' not in metric[0]]
+# 监控由工作时长推出的时效列，事件中不带
+DERIVED_COLUMNS = ['节点审批时效情况（≤1；＞1）', '节点审批时效是否大于3天']
+
+
+def test_snapshot_matches_batch_report_with_pending_nodes(approval_workbook):
+    """同一批事件（含未办结节点）的在线快照与批量 finalize_report 的结果一致"""
+    main = pd.read_excel(approval_workbook, sheet_name='主表').drop(columns=DERIVED_COLUMNS)
+    assert main['单个节点审批结束时间'].isna().any()
+    reference = 审批计算.load_reference_data(approval_workbook)
+
+    monitor = SlaMonitor(reference, metrics=METRICS)
+    for event in main.astype(object).where(main.notna(), None).to_dict('records'):
+        monitor.process(event)
+
+    batch = 审批计算.enrich_approval_data(main.copy(), reference)
+    work_days = batch['该节点审批工作时长']
+    batch['节点审批时效情况（≤1；＞1）'] = np.where(work_days <= 1, '<=1', '>1')
+    batch['节点审批时效是否大于3天'] = np.where(work_days > 3, 'Y', 'N')
+
+    for dimension in 审批计算.REPORT_SHEETS.values():
+        expected = 审批计算.finalize_report(
+            [审批计算.report_partial(batch, [dimension], METRICS)], dimension, METRICS
+        )
+        pd.testing.assert_frame_equal(
+            monitor.snapshot(dimension, METRICS), expected, check_dtype=False, check_names=False
+        )
@@ -0,0 +1,18 @@
+import numpy as np
+
+from time_parse_utils import parse_timestamps
+from work_time_utils import calculate_work_durations
+
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+
+
+def test_out_of_range_dates_are_missing_not_wrapped():
+    """9999-12-31 等超出纳秒精度范围的日期按缺失处理，不会回绕成1816年算出几万天"""
+    start = parse_timestamps(['9999-12-31', '2025-01-02 09:00:00', '2025-01-06 09:00:00'], TIME_FORMATS)
+    end = parse_timestamps(['2025-01-03', '2025-01-03 09:00:00', '9999-12-31'], TIME_FORMATS)
+
+    durations = calculate_work_durations(start, end, ['2025-01-01'])
+
+    assert np.isnan(durations[0])
+    assert durations[1] == 1.0
+    assert np.isnan(durations[2])
@@ -0,0 +1,75 @@
+"""
+时间列批量解析公共模块
+
+供 计算实际时长-均值-置信度.py 和 数据一致性核对/终版 copy.py 共用。
+先对整列抽样推断格式，再按固定格式整列解析；只有解析失败的值才逐个尝试
+其余格式，且结果按唯一字符串缓存。审批导出中同一时间戳大量重复，
+整列只需解析一次各个不同的字符串。
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+# 抽样推断格式时使用的唯一值个数
+SAMPLE_SIZE = 1000
+# 解析结果的精度：纳秒精度只能表示 1677-2262 年，9999-12-31 等占位日期会溢出回绕
+TIMESTAMP_DTYPE = 'datetime64[us]'
+
+
+@lru_cache(maxsize=None)
+def parse_single(text, formats):
+    """按候选格式顺序逐个尝试解析单个字符串，全部失败返回 None"""
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def infer_format(texts, formats, sample_size=SAMPLE_SIZE):
+    """抽样推断整列格式：返回样本中解析成功最多的格式（并列时取靠前的）"""
+    sample = pd.Series(texts[:sample_size], dtype=object)
+    best_fmt, best_hits = formats[0], -1
+    for fmt in formats:
+        hits = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if hits > best_hits:
+            best_fmt, best_hits = fmt, hits
+    return best_fmt
+
+
+def parse_timestamps(values, formats, sample_size=SAMPLE_SIZE):
+    """
+    批量解析时间列
+    :param values: 时间列（Series/列表），字符串按候选格式解析，已是时间类型的值原样保留
+    :param formats: 候选格式列表，按优先级排列
+    :param sample_size: 推断格式时抽样的唯一值个数
+    :return: datetime64[us] Series（与输入同索引），无法解析的为 NaT；
+             用微秒精度以容纳 9999-12-31 等超出纳秒精度范围的日期
+    """
+    values = pd.Series(values)
+    formats = tuple(formats)
+    is_text = values.map(lambda x: isinstance(x, str))
+    result = pd.Series(pd.NaT, index=values.index, dtype=TIMESTAMP_DTYPE)
+
+    if (~is_text).any():
+        result[~is_text] = pd.to_datetime(values[~is_text], errors='coerce').astype(TIMESTAMP_DTYPE)
+    if not is_text.any():
+        return result
+
+    # 按唯一字符串解析，再按编码映射回各行
+    codes, uniques = pd.factorize(values[is_text].str.strip())
+    uniques = pd.Series(uniques, dtype=object)
+
+    fmt = infer_format(uniques.to_numpy(), formats, sample_size)
+    parsed = pd.to_datetime(uniques, format=fmt, errors='coerce').astype(TIMESTAMP_DTYPE)
+
+    # 固定格式解析失败的值，逐个按全部候选格式兜底
+    failed = parsed.isna()
+    if failed.any():
+        parsed[failed] = uniques[failed].map(lambda x: parse_single(x, formats)).astype(TIMESTAMP_DTYPE)
+
+    result[is_text] = parsed.to_numpy(dtype=TIMESTAMP_DTYPE)[codes]
+    return result
@@ -0,0 +1,249 @@
+"""
+工作时长计算公共模块
+
+供 审批计算.py、审批计算_GUI(1).py、计算实际时长-均值-置信度.py 以及
+临时活/datetime_utils.py 共用。
+WorkCalendar 按日预计算累计工作秒数，整列传入到达时间和结束时间后，
+每行的工作时长只需两次二分查找加一次相减，不再逐行 apply、逐天循环。
+指定班次模板（如 08:30-12:00、13:00-17:30）时只计班次内的时间，
+当日已过的班次时间按班次边界插值得到，计算量同样与跨越天数无关。
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+DAY_SECONDS = 24 * 3600
+
+# 默认工作日掩码：周一至周五
+WEEKDAYS = '1111100'
+# 只排除假期清单中的日期（清单本身已包含周末时使用）
+ALL_DAYS = '1111111'
+
+# 假期sheet中调休上班日所在列（可选）
+MAKEUP_COLUMN = '调休上班日'
+
+# 常用班次模板：上午、下午各一段
+OFFICE_SHIFTS = [('08:30', '12:00'), ('13:00', '17:30')]
+
+# 工作时长计算口径的版本，计算规则调整时加1，使依赖日历指纹的缓存结果全部重算
+CALENDAR_VERSION = 1
+
+
+def _time_seconds(text):
+    """'08:30' / '08:30:00' 转为当日秒数"""
+    parts = [int(part) for part in str(text).split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+
+def parse_shifts(shifts):
+    """
+    班次模板转为当日秒数的断点及各断点处已累计的班次秒数，供 np.interp 插值
+    :param shifts: [(开始, 结束), ...]，如 OFFICE_SHIFTS；为空时表示全天24小时
+    """
+    if not shifts:
+        return np.array([0, DAY_SECONDS]), np.array([0, DAY_SECONDS])
+
+    bounds = sorted((_time_seconds(start), _time_seconds(end)) for start, end in shifts)
+    points, totals, total, previous_end = [0], [0], 0, 0
+    for start, end in bounds:
+        if not previous_end <= start < end <= DAY_SECONDS:
+            raise ValueError(f"班次须在当日内、结束晚于开始且互不重叠: {shifts}")
+        points += [start, end]
+        totals += [total, total + end - start]
+        total += end - start
+        previous_end = end
+    points.append(DAY_SECONDS)
+    totals.append(total)
+    return np.array(points), np.array(totals)
+
+
+def to_day_array(dates):
+    """将日期列表（date/datetime/字符串均可）转换为去重排序后的 datetime64[D] 数组"""
+    if dates is None or len(dates) == 0:
+        return np.array([], dtype='datetime64[D]')
+    days = pd.to_datetime(pd.Series(list(dates)), errors='coerce').dropna()
+    return np.unique(days.to_numpy().astype('datetime64[D]'))
+
+
+def _to_ns_array(values):
+    # 已是 datetime64[ns] 数组时直接使用，逐条调用（如在线监控）时省去解析开销
+    if isinstance(values, np.ndarray) and values.dtype == 'datetime64[ns]':
+        return values
+    times = pd.to_datetime(pd.Series(values))
+    # 纳秒精度只能表示 1677-2262 年，超出范围的时间（如 9999-12-31 占位日期）按缺失处理，避免转换时溢出回绕
+    times = times.where(times.between(pd.Timestamp.min, pd.Timestamp.max))
+    return times.to_numpy(dtype='datetime64[ns]')
+
+
+class WorkCalendar:
+    """
+    工作日历
+    :param holidays: 非工作日列表（如 附2 方太春节假期、方太非工作日清单）
+    :param workdays: 调休上班日列表，优先级高于周末和假期
+    :param weekmask: 一周工作日掩码，默认周一至周五
+    :param shifts: 班次模板（如 OFFICE_SHIFTS），默认工作日按24小时计算
+    """
+
+    def __init__(self, holidays=None, workdays=None, weekmask=WEEKDAYS, shifts=None):
+        self.holidays = to_day_array(holidays)
+        self.workdays = to_day_array(workdays)
+        self.weekmask = weekmask
+        self.shift_points, self.shift_totals = parse_shifts(shifts)
+        # 每个工作日的工作秒数
+        self.day_seconds = int(self.shift_totals[-1])
+        self.days = np.array([], dtype='datetime64[D]')
+        self.day_is_work = np.array([], dtype=bool)
+        self.cum_seconds = np.zeros(1, dtype=np.int64)
+        self.cum_days = np.zeros(1, dtype=np.int64)
+
+        known = np.concatenate([self.holidays, self.workdays])
+        if len(known):
+            self._build(known.min(), known.max())
+
+    @classmethod
+    def from_frame(cls, holiday_df, date_column, workday_column=MAKEUP_COLUMN, weekmask=WEEKDAYS, shifts=None):
+        """由假期sheet构建，存在调休上班日列时一并读取"""
+        workdays = None
+        if workday_column in holiday_df.columns:
+            workdays = holiday_df[workday_column].dropna()
+        return cls(holiday_df[date_column].dropna(), workdays, weekmask, shifts)
+
+    @classmethod
+    def from_excel(cls, file_path, sheet_name=0, date_column='方太假期',
+                   workday_column=MAKEUP_COLUMN, weekmask=WEEKDAYS, shifts=None):
+        holiday_df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+        return cls.from_frame(holiday_df, date_column, workday_column, weekmask, shifts)
+
+    def fingerprint(self):
+        """日历指纹：假期、调休上班日、工作日掩码、班次模板及计算口径版本任一变化时随之变化"""
+        digest = hashlib.md5()
+        for array in (self.holidays, self.workdays, self.shift_points, self.shift_totals):
+            digest.update(array.astype(np.int64).tobytes())
+            digest.update(b'|')
+        digest.update(f"{self.weekmask}|{CALENDAR_VERSION}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _build(self, first_day, last_day):
+        # 多建一天，保证 last_day 当天的时刻也能取到当天起点的累计值
+        days = np.arange(first_day, last_day + np.timedelta64(2, 'D'), dtype='datetime64[D]')
+        is_work = np.is_busday(days, weekmask=self.weekmask, holidays=self.holidays)
+        is_work |= np.isin(days, self.workdays)
+
+        self.days = days
+        self.day_is_work = is_work
+        # cum_seconds[i] 为 days[0] 零点到 days[i] 零点之间的工作秒数，cum_days[i] 为其间的工作日数
+        self.cum_days = np.concatenate([[0], np.cumsum(is_work.astype(np.int64))])
+        self.cum_seconds = self.cum_days * self.day_seconds
+
+    def _ensure_range(self, first_day, last_day):
+        if len(self.days) and first_day >= self.days[0] and last_day < self.days[-1]:
+            return
+        if len(self.days):
+            first_day = min(first_day, self.days[0])
+            last_day = max(last_day, self.days[-2])
+        self._build(first_day, last_day)
+
+    def _day_index(self, days):
+        self._ensure_range(days.min(), days.max())
+        return np.searchsorted(self.days, days)
+
+    def is_workday(self, dates):
+        """判断是否为工作日；传入单个日期返回bool，传入一列日期返回bool数组"""
+        scalar = np.ndim(dates) == 0
+        days = _to_ns_array([dates] if scalar else dates).astype('datetime64[D]')
+        idx = self._day_index(days)
+        result = self.day_is_work[idx]
+        return bool(result[0]) if scalar else result
+
+    def _seconds_until(self, times):
+        """days[0] 零点到各时刻之间的累计工作秒数"""
+        days = times.astype('datetime64[D]')
+        idx = self._day_index(days)
+        into_day = (times - days.astype('datetime64[ns]')) / np.timedelta64(1, 's')
+        # 当日零点到该时刻之间落在班次内的秒数
+        worked_today = np.interp(into_day, self.shift_points, self.shift_totals)
+        return self.cum_seconds[idx] + np.where(self.day_is_work[idx], worked_today, 0.0)
+
+    def work_seconds(self, start_times, end_times):
+        """
+        批量计算工作秒数（剔除非工作日，工作日按24小时或班次模板计算）
+        :return: numpy 数组；结束早于开始时为0，时间缺失时为 NaN
+        """
+        start = _to_ns_array(start_times)
+        end = _to_ns_array(end_times)
+        valid = ~(np.isnat(start) | np.isnat(end))
+        seconds = np.full(len(start), np.nan)
+        if not valid.any():
+            return seconds
+
+        start, end = start[valid], end[valid]
+        # 先一次性覆盖首尾日期，避免两次查找之间日历重建导致基准不同
+        all_days = np.concatenate([start, end]).astype('datetime64[D]')
+        self._ensure_range(all_days.min(), all_days.max())
+        elapsed = self._seconds_until(end) - self._seconds_until(start)
+        seconds[valid] = np.where(end > start, elapsed, 0.0)
+        return seconds
+
+    def work_durations(self, start_times, end_times):
+        """批量计算工作时长（单位：天，按24小时折算）"""
+        return self.work_seconds(start_times, end_times) / DAY_SECONDS
+
+    def work_hours(self, start_times, end_times):
+        """批量计算工作时长（单位：小时）"""
+        return self.work_seconds(start_times, end_times) / 3600
+
+    def work_days(self, start_dates, end_dates):
+        """
+        批量计算 [开始日期, 结束日期) 之间的工作日天数，结束早于开始时为负数
+        :return: float 数组，日期缺失时为 NaN
+        """
+        start = _to_ns_array(start_dates).astype('datetime64[D]')
+        end = _to_ns_array(end_dates).astype('datetime64[D]')
+        valid = ~(np.isnat(start) | np.isnat(end))
+        days = np.full(len(start), np.nan)
+        if not valid.any():
+            return days
+
+        start, end = start[valid], end[valid]
+        all_days = np.concatenate([start, end])
+        self._ensure_range(all_days.min(), all_days.max())
+        start_idx = self._day_index(start)
+        end_idx = self._day_index(end)
+        days[valid] = self.cum_days[end_idx] - self.cum_days[start_idx]
+        return days
+
+
+def calculate_work_durations(start_times, end_times, holidays, weekmask=WEEKDAYS):
+    """
+    批量计算工作时长（剔除节假日及周末，按24小时计算）
+    :param start_times: 开始时间列（Series/数组）
+    :param end_times: 结束时间列（Series/数组），长度与开始时间一致
+    :param holidays: 假期日期列表，或已构建好的 WorkCalendar
+    :param weekmask: 一周工作日掩码，默认周一至周五；传 ALL_DAYS 表示只排除假期
+    :return: 工作时长（天）的 numpy 数组；结束早于开始时为0，时间缺失时为 NaN
+    """
+    if isinstance(holidays, WorkCalendar):
+        calendar = holidays
+    else:
+        calendar = WorkCalendar(holidays, weekmask=weekmask)
+    return calendar.work_durations(start_times, end_times)
+
+
+def calculate_office_hours(start_times, end_times, holidays, shifts=OFFICE_SHIFTS, weekmask=WEEKDAYS):
+    """
+    批量计算班次内工作小时数（剔除节假日及周末，只计班次模板内的时间）
+    :param holidays: 假期日期列表，或已构建好的 WorkCalendar（此时 shifts、weekmask 以日历为准）
+    :return: 小时数的 numpy 数组；结束早于开始时为0，时间缺失时为 NaN
+    """
+    if isinstance(holidays, WorkCalendar):
+        calendar = holidays
+    else:
+        calendar = WorkCalendar(holidays, weekmask=weekmask, shifts=shifts)
+    return calendar.work_hours(start_times, end_times)
+
+
+def calculate_work_duration(start_time, end_time, holidays, weekmask=WEEKDAYS):
+    """单条记录的工作时长（天），与 calculate_work_durations 口径一致"""
+    return float(calculate_work_durations([start_time], [end_time], holidays, weekmask)[0])
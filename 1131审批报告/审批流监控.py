@@ -0,0 +1,248 @@
+"""
+审批时效在线监控
+
+逐条读取审批节点事件（JSONL 文件或本地 socket，每行一个 JSON 对象，键与主表列名一致，
+至少包含 审批人工号、流程名称、审批节点名称、单个节点审批到达时间、单个节点审批结束时间），
+每条事件到达时：
+- 用与批量计算相同的工作日历计算工作时长，按 附3特殊节点合理时长 判断是否超时并立即提示；
+- 以 O(1) 的在线方式更新各体系、一级组织、流程、审批节点的计数、均值、方差（Welford）和延期分级；
+snapshot() 随时给出与 generate_report_1 同样列的汇总。
+
+用法：python 审批流监控.py 参考数据.xlsx --jsonl 事件.jsonl [--follow]
+      python 审批流监控.py 参考数据.xlsx --port 9999
+参考数据.xlsx 需包含 附1、附2、附3 三个sheet（与主流程的输入文件相同即可）。
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+from work_time_utils import DAY_SECONDS
+from 审批计算 import REPORT_1_METRICS, REPORT_SHEETS, BUCKET_BINS, BUCKET_LABELS, load_reference_data
+
+# 监控的指标：汇总报告指标之外，加上超时节点数、延期分级和工作时长标准差
+MONITOR_METRICS = REPORT_1_METRICS + [
+    ('超时节点数', 'count_if', ('是否超时', 'Y')),
+    ('超时节点比例', 'ratio', ('超时节点数', 'A-审批总次数')),
+] + [
+    (f'延期{label}的节点数', 'count_if', ('延期时长情况：≤1；1<X≤2；2<X≤3；>3', label)) for label in BUCKET_LABELS
+] + [
+    ('工作时长标准差（天）', 'std', '该节点审批工作时长'),
+]
+
+# 每处理多少条事件输出一次快照
+SNAPSHOT_EVERY = 1000
+# 跟随读取 JSONL 文件时，没有新行后的等待间隔（秒）
+POLL_INTERVAL = 1.0
+
+def duration_label(days):
+    """规整（保留2位小数，小于0设为0）后按1，2，3天分级，与批量计算口径一致"""
+    if days is None or math.isnan(days):
+        return None
+    days = max(0, round(days, 2))
+    for upper, label in zip(BUCKET_BINS[1:], BUCKET_LABELS):
+        if days <= upper:
+            return label
+
+class RunningStat:
+    """Welford 在线均值、方差"""
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+class SlaMonitor:
+    """
+    审批时效在线监控
+    :param reference: load_reference_data 的返回值（人员维表、工作日历、特殊节点合理时长）
+    :param report_sheets: 汇总维度，默认与批量报告相同
+    :param metrics: 在线维护的指标，定义格式同 REPORT_1_METRICS
+    """
+
+    def __init__(self, reference, report_sheets=REPORT_SHEETS, metrics=MONITOR_METRICS):
+        self.reference = reference
+        self.dimensions = list(report_sheets.values())
+        self.metrics = metrics
+        self.processed = 0
+        self.late = 0
+        # {维度: {维度取值: {指标名: 计数 或 RunningStat}}}
+        self.groups = {dimension: {} for dimension in self.dimensions}
+        # 逐条查找用字典，避免每条事件都做 DataFrame 索引
+        self.staff = reference['staff_table'].to_dict('index')
+        self.node_durations = reference['node_durations'].to_dict()
+
+    def enrich(self, event):
+        """补充人员信息、计算时长和超时情况，口径与批量计算相同；主表导出的时效列缺失时由计算值补齐"""
+        record = dict(event)
+        for column, value in self.staff.get(record.get('审批人工号'), {}).items():
+            record.setdefault(column, value)
+
+        arrive = pd.Timestamp(record.get('单个节点审批到达时间'))
+        finish = pd.Timestamp(record.get('单个节点审批结束时间'))
+        work_days = float(self.reference['calendar'].work_durations(
+            np.array([arrive.to_datetime64()], dtype='datetime64[ns]'),
+            np.array([finish.to_datetime64()], dtype='datetime64[ns]')
+        )[0])
+        # 未办结（结束时间为空）的节点工作时长记为0，与批量计算 enrich_approval_data 一致
+        if math.isnan(work_days):
+            work_days = 0.0
+        natural_days = (finish - arrive).total_seconds() / DAY_SECONDS if pd.notna(arrive) and pd.notna(finish) else np.nan
+        record['该节点审批工作时长'] = work_days
+        record['该节点审批自然时长'] = natural_days
+        record.setdefault('节点审批时效情况（≤1；＞1）', '<=1' if work_days <= 1 else '>1')
+        record.setdefault('节点审批时效是否大于3天', 'Y' if work_days > 3 else 'N')
+        record.setdefault('该节点审批自然时长（单位：天）', natural_days)
+        record.setdefault('该节点审批工作时长（单位：天）——剔除节假日及周末，按24小时计算', work_days)
+
+        # 匹配节点合理审批时长，默认值为1
+        threshold = self.node_durations.get(record.get('流程名称'), 1)
+        record['节点审批时长'] = threshold
+        record['节点审批延期时长(实际工作时长-节点审批时长）'] = work_days - threshold
+        record['延期时长情况：≤1；1<X≤2；2<X≤3；>3'] = duration_label(work_days - threshold)
+        record['是否超时'] = 'Y' if work_days > threshold else 'N'
+        return record
+
+    def update(self, record):
+        """把一条已补充的记录累加到各维度的分组中"""
+        for dimension in self.dimensions:
+            key = record.get(dimension)
+            if key is None or (isinstance(key, float) and math.isnan(key)):
+                continue
+            totals = self.groups[dimension].setdefault(key, {})
+            for name, kind, param in self.metrics:
+                if kind == 'count':
+                    value = record.get(param)
+                    totals[name] = totals.get(name, 0) + (value is not None and not pd.isna(value))
+                elif kind == 'count_if':
+                    column, expected = param
+                    totals[name] = totals.get(name, 0) + (record.get(column) == expected)
+                elif kind == 'mean' or kind == 'std':
+                    value = record.get(param)
+                    stat = totals.setdefault(name, RunningStat())
+                    if value is not None and not pd.isna(value):
+                        stat.update(float(value))
+
+    def process(self, event):
+        """处理一条事件，返回补充后的记录"""
+        record = self.enrich(event)
+        self.update(record)
+        self.processed += 1
+        if record['是否超时'] == 'Y':
+            self.late += 1
+        return record
+
+    def snapshot(self, dimension, metrics=REPORT_1_METRICS):
+        """当前汇总，列与 generate_report_1 / finalize_report 的输出一致"""
+        groups = self.groups[dimension]
+        rows = []
+        for key in sorted(groups):
+            totals = groups[key]
+            row = {dimension: key}
+            for name, kind, param in metrics:
+                if kind == 'count' or kind == 'count_if':
+                    row[name] = totals.get(name, 0)
+                elif kind == 'mean':
+                    stat = totals.get(name)
+                    row[name] = stat.mean if stat is not None and stat.count else np.nan
+                elif kind == 'std':
+                    stat = totals.get(name)
+                    row[name] = stat.std if stat is not None else np.nan
+                elif kind == 'ratio':
+                    numerator, denominator = param
+                    row[name] = row[numerator] / row[denominator] if row[denominator] else np.nan
+            rows.append(row)
+        columns = [dimension] + [name for name, _, _ in metrics]
+        return pd.DataFrame(rows, columns=columns).round(2)
+
+def iter_jsonl(file_path, follow=False, poll_interval=POLL_INTERVAL):
+    """逐行读取 JSONL 文件；follow=True 时读到末尾后继续等待新写入的行"""
+    with open(file_path, encoding='utf-8') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+                continue
+            if line.strip():
+                yield json.loads(line)
+
+def iter_socket(host, port):
+    """在本地端口监听，逐个接受连接并逐行读取 JSON 事件"""
+    with socket.create_server((host, port)) as server:
+        print(f"正在监听 {host}:{port}")
+        while True:
+            connection, address = server.accept()
+            with connection, connection.makefile(encoding='utf-8') as stream:
+                for line in stream:
+                    if line.strip():
+                        yield json.loads(line)
+
+def write_snapshot(monitor, file_path):
+    """将各维度的当前汇总写成JSON（先写临时文件再替换，读取方不会读到半个文件）"""
+    snapshot = {
+        'processed': monitor.processed,
+        'late': monitor.late,
+        'reports': {
+            sheet_name: json.loads(monitor.snapshot(dimension, monitor.metrics).to_json(orient='records', force_ascii=False))
+            for sheet_name, dimension in REPORT_SHEETS.items()
+        },
+    }
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='审批时效在线监控')
+    parser.add_argument('reference_file', help='包含 附1、附2、附3 的Excel文件')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--jsonl', help='事件 JSONL 文件')
+    source.add_argument('--port', type=int, help='在本地端口接收事件')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--follow', action='store_true', help='JSONL 文件读完后继续等待新事件')
+    parser.add_argument('--snapshot-every', type=int, default=SNAPSHOT_EVERY, help='每处理多少条事件输出一次快照')
+    parser.add_argument('--snapshot-file', help='快照JSON输出路径，默认只打印按体系汇总')
+    args = parser.parse_args()
+
+    monitor = SlaMonitor(load_reference_data(args.reference_file))
+    events = iter_jsonl(args.jsonl, args.follow) if args.jsonl else iter_socket(args.host, args.port)
+
+    try:
+        for event in events:
+            record = monitor.process(event)
+            if record['是否超时'] == 'Y':
+                print(f"超时: {record.get('流程名称')} / {record.get('审批节点名称')} / {record.get('审批人姓名', record.get('审批人工号'))}"
+                      f" 工作时长 {record['该节点审批工作时长']:.2f} 天，合理时长 {record['节点审批时长']} 天")
+            if monitor.processed % args.snapshot_every == 0:
+                if args.snapshot_file:
+                    write_snapshot(monitor, args.snapshot_file)
+                else:
+                    print(monitor.snapshot('审批人所在体系').to_string(index=False))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"共处理 {monitor.processed} 条事件，其中超时 {monitor.late} 条")
+        if args.snapshot_file:
+            write_snapshot(monitor, args.snapshot_file)
+
+if __name__ == '__main__':
+    main()
@@ -1,158 +1,789 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-
-def is_workday(date, holidays):
-    # 判断是否为工作日（非周末且非节假日）
-    return date.weekday() < 5 and date not in holidays
-
-def calculate_work_duration(start_time, end_time, holidays):
-    # 计算工作时间（排除节假日和周末）
-    current = start_time
-    work_duration = timedelta()
-    
-    while current < end_time:
-        next_day = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0)
-        if is_workday(current.date(), holidays):
-            work_duration += min(next_day, end_time) - current
-        current = next_day
-    
-    return work_duration.total_seconds() / (24 * 3600)  # 转换为天数
+from openpyxl import Workbook, load_workbook
+from work_time_utils import WorkCalendar, calculate_work_durations, DAY_SECONDS
 
-def generate_report_1(merged_data):
-    """生成第一个汇总报告：按审批人所在体系分组统计"""
-    # 确保分组列存在
-    if '审批人所在体系' not in merged_data.columns:
-        raise ValueError("数据中缺少'审批人所在体系'列")
-    
-    # 确保所有需要的列都存在
-    required_columns = ['流程名称', '节点审批时效情况（≤1；＞1）', 
-                       '节点审批时效是否大于3天', '该节点审批自然时长（单位：天）',
-                       '该节点审批工作时长（单位：天）——剔除节假日及周末，按24小时计算']
-    missing_cols = [col for col in required_columns if col not in merged_data.columns]
+INPUT_FILE_PATH = r"C:\Users\zhangbon\Desktop\临时活\1131统计\Q1审批时效数据分析打样-0513.xlsx"
+OUTPUT_FILE_PATH = r'C:\Users\zhangbon\Desktop\审批结果.xlsx'
+
+# 人员清单可单独维护一个文件（如每季度通用的花名册），为 None 时读取输入文件中的附1
+STAFF_FILE_PATH = None
+# 附表解析结果缓存目录，文件未修改时不再重复解析Excel
+REFERENCE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '缓存')
+
+# 人员清单列与主表补充列的对照关系
+STAFF_COLUMNS = {
+    '姓名': '审批人姓名',
+    '审批人所在体系': '审批人所在体系',
+    '一级组织名称': '审批人所在一级组织',
+}
+
+# 增量模式：按流程实例和节点识别记录，已算好的结果保存在本地 Parquet 文件中，
+# 每次只计算新增或内容有变化的记录
+INCREMENTAL_MODE = False
+# 流程实例编号列
+INSTANCE_COLUMN = '流程实例ID'
+RECORD_KEY_COLUMNS = [INSTANCE_COLUMN, '审批节点名称', '审批人工号', '单个节点审批到达时间']
+STORE_FILE_PATH = os.path.join(REFERENCE_CACHE_DIR, '审批结果库.parquet')
+# 结果库中的内部列：记录键哈希、原始行内容哈希，导出时去掉
+RECORD_KEY_COLUMN = '_记录键'
+ROW_HASH_COLUMN = '_行哈希'
+
+# 分块模式：主表按行分块读取、计算并追加写出，适合全年数据
+CHUNKED_MODE = False
+CHUNKSIZE = 50000
+
+# 紧凑模式：维度列和分级列用 category，数值列降精度，规整/截断后的列导出时再计算
+COMPACT_MODE = False
+DIMENSION_COLUMNS = ['审批人工号', '审批人姓名', '流程名称', '审批节点名称', '审批人所在体系', '审批人所在一级组织']
+BUCKET_BINS = [-np.inf, 1, 2, 3, np.inf]
+BUCKET_LABELS = ['≤1', '1<X≤2', '2<X≤3', '>3']
+# 降为 float32 的浮点列：只取取值本身不超过6位小数的派生列，导出时 round(6) 可原样还原；
+# 主表原有的浮点列及各项时长保留 float64，保证导出结果与普通模式一致
+FLOAT32_COLUMNS = ['节点审批时长']
+
+# 汇总报告指标定义：(输出列名, 指标类型, 参数)，输出列顺序与定义顺序一致
+# count: 参数为列名，统计非空行数
+# count_if: 参数为 (列名, 取值)，统计等于该取值的行数
+# mean: 参数为列名，计算非空值均值
+# std: 参数为列名，计算非空值的样本标准差
+# ratio: 参数为 (分子指标, 分母指标)，两者须在前面定义
+REPORT_1_METRICS = [
+    ('A-审批总次数', 'count', '流程名称'),
+    ('B-单个节点审批时长≤1天的节点数', 'count_if', ('节点审批时效情况（≤1；＞1）', '<=1')),
+    ('C-单个节点审批时长≤1天的节点比例', 'ratio', ('B-单个节点审批时长≤1天的节点数', 'A-审批总次数')),
+    ('D-单个节点审批时长＞1天的节点数', 'count_if', ('节点审批时效情况（≤1；＞1）', '>1')),
+    ('E-其中：单个节点审批时长>3天的节点数', 'count_if', ('节点审批时效是否大于3天', 'Y')),
+    ('F-其中：单个节点审批时长>3天的节点比例', 'ratio', ('E-其中：单个节点审批时长>3天的节点数', 'A-审批总次数')),
+    ('G-单个节点平均审批时长（自然日）', 'mean', '该节点审批自然时长（单位：天）'),
+    ('H-单个节点平均审批时长（工作日）', 'mean', '该节点审批工作时长（单位：天）——剔除节假日及周末，按24小时计算'),
+]
+
+# 汇总sheet名与分组维度
+REPORT_SHEETS = {
+    '按体系汇总': '审批人所在体系',
+    '按一级组织汇总': '审批人所在一级组织',
+    '按流程汇总': '流程名称',
+    '按审批节点汇总': '审批节点名称',
+}
+
+# 汇总立方体：按以下维度及季度保存可累加的度量，任意维度组合的上卷都由它得到
+CUBE_DIMENSIONS = ['审批人所在体系', '审批人所在一级组织', '流程名称', '审批节点名称']
+QUARTER_COLUMN = '季度'
+# 季度按节点到达时间划分
+QUARTER_SOURCE = '单个节点审批到达时间'
+CUBE_ROW_COUNT = '记录数'
+CUBE_METRICS = REPORT_1_METRICS + [
+    (f'时效{label}的节点数', 'count_if', ('节点审批时效情况：≤1；1<X≤2；2<X≤3；>3', label)) for label in BUCKET_LABELS
+] + [
+    (f'延期{label}的节点数', 'count_if', ('延期时长情况：≤1；1<X≤2；2<X≤3；>3', label)) for label in BUCKET_LABELS
+] + [
+    ('平均工作时长（天）', 'mean', '该节点审批工作时长'),
+    ('工作时长标准差（天）', 'std', '该节点审批工作时长'),
+    ('平均自然时长（天）', 'mean', '该节点审批自然时长'),
+    ('自然时长标准差（天）', 'std', '该节点审批自然时长'),
+    # 季度列总有取值（缺失为 'NaT'），即每组的明细行数；减去被替换的记录后为0的分组删除
+    (CUBE_ROW_COUNT, 'count', QUARTER_COLUMN),
+]
+# 立方体文件与结果文件（或结果库）同目录，文件名加此后缀
+CUBE_SUFFIX = '_汇总立方体.parquet'
+
+# 待审批积压分析：sheet名与分组列
+BACKLOG_SHEETS = {
+    '审批人积压': ['审批人工号', '审批人姓名'],
+    '体系积压': ['审批人所在体系'],
+}
+
+# 流程实例中第一个节点的上一节点名称
+START_NODE = '（发起）'
+
+def is_workday(date, calendar):
+    # 判断是否为工作日（非周末且非节假日，调休上班日算工作日）
+    return calendar.is_workday(date)
+
+def compile_metrics(merged_data, metrics=REPORT_1_METRICS):
+    """
+    把指标定义编译为可累加的布尔/数值列：
+    count、count_if 编译为一列布尔值，mean 编译为合计列和计数列，
+    std 在此基础上再加平方和列，ratio 在汇总后计算
+    """
+    required_columns = []
+    for name, kind, param in metrics:
+        if kind in ('count', 'mean', 'std'):
+            required_columns.append(param)
+        elif kind == 'count_if':
+            required_columns.append(param[0])
+    missing_cols = [col for col in dict.fromkeys(required_columns) if col not in merged_data.columns]
     if missing_cols:
         raise ValueError(f"数据中缺少必要的列: {missing_cols}")
-    
-    report = merged_data.groupby('审批人所在体系').agg(
-        **{
-            'A-审批总次数': ('流程名称', 'count'),
-            'B-单个节点审批时长≤1天的节点数': ('节点审批时效情况（≤1；＞1）', lambda x: (x == '<=1').sum()),
-            'D-单个节点审批时长＞1天的节点数': ('节点审批时效情况（≤1；＞1）', lambda x: (x == '>1').sum()),
-            'E-其中：单个节点审批时长>3天的节点数': ('节点审批时效是否大于3天', lambda x: (x == 'Y').sum()),
-            'G-单个节点平均审批时长（自然日）': ('该节点审批自然时长（单位：天）', 'mean'),
-            'H-单个节点平均审批时长（工作日）': ('该节点审批工作时长（单位：天）——剔除节假日及周末，按24小时计算', 'mean')
-        }
-    )
-    
-    # 计算比例列
-    report['C-单个节点审批时长≤1天的节点比例'] = report['B-单个节点审批时长≤1天的节点数'] / report['A-审批总次数']
-    report['F-其中：单个节点审批时长>3天的节点比例'] = report['E-其中：单个节点审批时长>3天的节点数'] / report['A-审批总次数']
-    
-    # 重置索引，将'审批人所在体系'变为普通列
+
+    compiled = {}
+    for name, kind, param in metrics:
+        if kind == 'count':
+            compiled[name] = merged_data[param].notna()
+        elif kind == 'count_if':
+            column, value = param
+            compiled[name] = merged_data[column] == value
+        elif kind == 'mean' or kind == 'std':
+            values = merged_data[param].astype(float)
+            compiled[name + '|合计'] = values.fillna(0)
+            compiled[name + '|计数'] = values.notna()
+            if kind == 'std':
+                compiled[name + '|平方和'] = (values ** 2).fillna(0)
+        elif kind != 'ratio':
+            raise ValueError(f"不支持的指标类型: {kind}")
+    return pd.DataFrame(compiled, index=merged_data.index)
+
+def report_partial(merged_data, dimensions, metrics=REPORT_1_METRICS):
+    """
+    报告的可累加中间结果：按全部维度的组合一次分组求和
+    各维度的报告都由它上卷得到；分块处理时每块各算一份，最后由 finalize_report 合并
+    """
+    compiled = compile_metrics(merged_data, metrics)
+    for dimension in dimensions:
+        compiled[dimension] = merged_data[dimension]
+    # 保留空值分组，避免某个维度为空时其他维度的统计被漏掉
+    return compiled.groupby(list(dimensions), dropna=False, observed=True).sum()
+
+def finalize_report(partials, dimension, metrics=REPORT_1_METRICS):
+    """
+    合并中间结果并上卷到指定维度，按指标定义计算最终报告
+    :param dimension: 维度列名，或维度列名列表（多维度交叉汇总）
+    """
+    totals = pd.concat(partials).groupby(level=dimension).sum()
+
+    report = pd.DataFrame(index=totals.index)
+    for name, kind, param in metrics:
+        if kind == 'count' or kind == 'count_if':
+            report[name] = totals[name]
+        elif kind == 'mean':
+            report[name] = totals[name + '|合计'] / totals[name + '|计数']
+        elif kind == 'std':
+            count = totals[name + '|计数']
+            total = totals[name + '|合计']
+            variance = (totals[name + '|平方和'] - total ** 2 / count) / (count - 1)
+            # 舍入误差可能使方差略小于0；不足2个值时标准差为空
+            report[name] = np.sqrt(variance.clip(lower=0)).where(count > 1)
+        elif kind == 'ratio':
+            numerator, denominator = param
+            report[name] = report[numerator] / report[denominator]
+
+    # 重置索引，将维度列变为普通列；列顺序与指标定义一致
     report = report.reset_index()
-    
-    # 确保列顺序正确
-    report = report[[
-        '审批人所在体系',
-        'A-审批总次数',
-        'B-单个节点审批时长≤1天的节点数',
-        'C-单个节点审批时长≤1天的节点比例',
-        'D-单个节点审批时长＞1天的节点数',
-        'E-其中：单个节点审批时长>3天的节点数',
-        'F-其中：单个节点审批时长>3天的节点比例',
-        'G-单个节点平均审批时长（自然日）',
-        'H-单个节点平均审批时长（工作日）'
-    ]]
-    
+
     # 保留2位小数
     report = report.round(2)
-    
+
     return report
 
-def process_approval_data():
-    # 读取四个Excel文件
-    base_df = pd.read_excel(r"C:\Users\zhangbon\Desktop\临时活\1131统计\Q1审批时效数据分析打样-0513.xlsx",sheet_name="主表", engine='openpyxl')
-    staff_df = pd.read_excel(r"C:\Users\zhangbon\Desktop\临时活\1131统计\Q1审批时效数据分析打样-0513.xlsx",sheet_name="附1 最新在职人员及所属组织清单", engine='openpyxl')
-    holiday_df = pd.read_excel(r"C:\Users\zhangbon\Desktop\临时活\1131统计\Q1审批时效数据分析打样-0513.xlsx",sheet_name="附2 方太春节假期", engine='openpyxl')
-    special_node_df = pd.read_excel(r"C:\Users\zhangbon\Desktop\临时活\1131统计\Q1审批时效数据分析打样-0513.xlsx",sheet_name="附3特殊节点合理时长", engine='openpyxl')
-    
-    # 1. 先建立人员信息的映射字典
-    staff_mapping = staff_df.set_index('员工工号').to_dict('index')
-    print(staff_mapping)
-    
-    # 2. 将人员信息映射到基础表
-    base_df['审批人姓名'] = base_df['审批人工号'].map(lambda x: staff_mapping.get(x, {}).get('姓名'))
-    base_df['审批人所在体系'] = base_df['审批人工号'].map(lambda x: staff_mapping.get(x, {}).get('审批人所在体系'))
-    base_df['审批人所在一级组织'] = base_df['审批人工号'].map(lambda x: staff_mapping.get(x, {}).get('一级组织名称'))
-    
+def available_dimensions(merged_data, report_sheets=REPORT_SHEETS):
+    """返回数据中存在的汇总维度，缺失的维度打印警告后跳过"""
+    dimensions = []
+    for sheet_name, dimension in report_sheets.items():
+        if dimension in merged_data.columns:
+            dimensions.append(dimension)
+        else:
+            print(f"警告: 缺少'{dimension}'列，跳过{sheet_name}")
+    return dimensions
+
+def build_reports(partials, dimensions, report_sheets=REPORT_SHEETS, metrics=REPORT_1_METRICS):
+    """由中间结果生成各汇总sheet，返回 {sheet名: 报告}"""
+    return {
+        sheet_name: finalize_report(partials, dimension, metrics)
+        for sheet_name, dimension in report_sheets.items()
+        if dimension in dimensions
+    }
+
+def generate_reports(merged_data, report_sheets=REPORT_SHEETS, metrics=REPORT_1_METRICS):
+    """一次分组生成全部维度的汇总报告"""
+    dimensions = available_dimensions(merged_data, report_sheets)
+    partial = report_partial(merged_data, dimensions, metrics)
+    return build_reports([partial], dimensions, report_sheets, metrics)
+
+def quarter_of(merged_data):
+    """按节点到达时间取季度，如 2025Q1"""
+    return pd.to_datetime(merged_data[QUARTER_SOURCE]).dt.to_period('Q').astype(str)
+
+def cube_dimensions(merged_data):
+    """立方体的分组维度：数据中存在的 CUBE_DIMENSIONS 及季度"""
+    return [dimension for dimension in CUBE_DIMENSIONS if dimension in merged_data.columns] + [QUARTER_COLUMN]
+
+def build_cube(merged_data, metrics=CUBE_METRICS):
+    """
+    生成汇总立方体：按 CUBE_DIMENSIONS（数据中存在的）及季度分组的可累加度量
+    （节点数、各分级节点数、时长合计、平方和、计数），之后的上卷不再扫描明细
+    """
+    data = merged_data.assign(**{QUARTER_COLUMN: quarter_of(merged_data)})
+    return report_partial(data, cube_dimensions(merged_data), metrics)
+
+def cube_report(cube, dimension, metrics=CUBE_METRICS):
+    """
+    由立方体上卷出任意维度组合的报告，不再读取明细
+    :param cube: build_cube 的结果，或 save_cube 保存的立方体文件路径
+    :param dimension: 维度列名或列表，如 ['审批人所在体系', '季度']；metrics 用到的度量须已在立方体中
+    """
+    if isinstance(cube, str):
+        cube = load_cube(cube)
+    return finalize_report([cube], dimension, metrics)
+
+def merge_cubes(cubes, removed=()):
+    """
+    合并多个立方体（如历史立方体与本次新增记录的立方体），并减去 removed 中被替换记录的立方体，
+    记录数减为0的分组删除
+    """
+    parts = list(cubes) + [-cube for cube in removed]
+    levels = list(parts[0].index.names)
+    merged = pd.concat(parts).groupby(level=levels, dropna=False, observed=True).sum()
+    return merged[merged[CUBE_ROW_COUNT] > 0]
+
+def cube_path_for(file_path):
+    """立方体文件路径：与结果文件（或结果库）同目录同名，加 CUBE_SUFFIX 后缀"""
+    return os.path.splitext(file_path)[0] + CUBE_SUFFIX
+
+def save_cube(cube, cube_path):
+    """立方体的维度索引转为普通列后写成 parquet"""
+    os.makedirs(os.path.dirname(os.path.abspath(cube_path)), exist_ok=True)
+    cube.reset_index().to_parquet(cube_path, index=False)
+
+def load_cube(cube_path):
+    """读取 save_cube 保存的立方体，恢复维度索引"""
+    cube = pd.read_parquet(cube_path)
+    dimensions = [column for column in CUBE_DIMENSIONS + [QUARTER_COLUMN] if column in cube.columns]
+    return cube.set_index(dimensions)
+
+def backlog_events(merged_data, group_columns):
+    """
+    生成积压事件：到达 +1、结束 -1，按（分组, 时刻, 增量）排序，同一时刻先结束后到达
+    未结束的节点视为一直积压到数据中的最后时刻
+    :return: (分组编号, 时刻（纳秒整数）, 增量, 分组键)
+    """
+    groups = merged_data.groupby(group_columns, dropna=False, sort=True)
+    codes = groups.ngroup().to_numpy()
+    keys = groups.size().index
+
+    arrive = pd.to_datetime(merged_data['单个节点审批到达时间']).to_numpy(dtype='datetime64[ns]')
+    finish = pd.to_datetime(merged_data['单个节点审批结束时间']).to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(arrive)
+    codes, arrive, finish = codes[valid], arrive[valid], finish[valid]
+    if not len(codes):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, keys
+
+    pending = np.isnat(finish)
+    horizon = max(arrive.max(), finish[~pending].max()) if (~pending).any() else arrive.max()
+    finish = np.where(pending, horizon, np.maximum(finish, arrive))
+
+    event_codes = np.concatenate([codes, codes])
+    event_times = np.concatenate([arrive, finish]).view(np.int64)
+    deltas = np.concatenate([np.ones(len(codes), dtype=np.int64), -np.ones(len(codes), dtype=np.int64)])
+    order = np.lexsort((deltas, event_times, event_codes))
+    return event_codes[order], event_times[order], deltas[order], keys
+
+def backlog_report(merged_data, group_columns):
+    """
+    按分组统计待审批积压：节点数、峰值积压、首次达到峰值的时刻、按时间加权的平均积压
+    全部分组一次排序、一次累加：每组的到达与结束相互抵消，全局累加值就是组内积压数
+    平均积压 = 积压数对时间的积分 / 数据覆盖的总时长（首个到达至最后时刻）
+    """
+    codes, times, deltas, keys = backlog_events(merged_data, list(group_columns))
+    report = pd.DataFrame(index=keys)
+    n_groups = len(keys)
+    if not len(codes):
+        return report.reset_index()
+
+    backlog = np.cumsum(deltas)
+    # 每个事件后的积压保持到本组下一个事件；组内最后一个事件后积压为0
+    held_days = np.diff(times, append=times[-1]) / (DAY_SECONDS * 10 ** 9)
+    held_days[np.r_[codes[1:] != codes[:-1], True]] = 0
+    window_days = (times.max() - times.min()) / (DAY_SECONDS * 10 ** 9)
+
+    # 各组积压最大的第一个事件
+    events = pd.DataFrame({'code': codes, 'backlog': backlog, 'time': times})
+    peaks = events.loc[events.groupby('code')['backlog'].idxmax()].set_index('code').reindex(range(n_groups))
+
+    report['节点数'] = np.bincount(codes, minlength=n_groups) // 2
+    report['峰值积压'] = peaks['backlog'].to_numpy()
+    report['峰值时刻'] = pd.to_datetime(peaks['time'].to_numpy())
+    area = np.bincount(codes, weights=backlog * held_days, minlength=n_groups)
+    report['平均积压（按时间加权）'] = np.round(area / window_days, 2) if window_days else np.nan
+    return report.reset_index()
+
+def generate_backlog_reports(merged_data, backlog_sheets=BACKLOG_SHEETS):
+    """生成各分组的积压分析，分组列缺失时跳过"""
+    reports = {}
+    for sheet_name, group_columns in backlog_sheets.items():
+        missing_cols = [col for col in group_columns if col not in merged_data.columns]
+        if missing_cols:
+            print(f"警告: 缺少{missing_cols}列，跳过{sheet_name}")
+            continue
+        reports[sheet_name] = backlog_report(merged_data, group_columns)
+    return reports
+
+def instance_nodes(merged_data):
+    """
+    节点按流程实例、到达时间排序，并用组内 shift 取得同一实例的上一节点
+    上一节点结束到本节点到达之间为交接等待时长；并行节点先于上一节点结束到达时等待记为0
+    """
+    nodes = merged_data.loc[merged_data[INSTANCE_COLUMN].notna(), [
+        INSTANCE_COLUMN, '流程名称', '审批节点名称', '单个节点审批到达时间', '单个节点审批结束时间', '该节点审批工作时长'
+    ]].copy()
+    nodes['单个节点审批到达时间'] = pd.to_datetime(nodes['单个节点审批到达时间'])
+    nodes['单个节点审批结束时间'] = pd.to_datetime(nodes['单个节点审批结束时间'])
+    nodes = nodes.sort_values([INSTANCE_COLUMN, '单个节点审批到达时间', '单个节点审批结束时间'], kind='stable')
+
+    previous = nodes.groupby(INSTANCE_COLUMN, sort=False)[['审批节点名称', '单个节点审批结束时间']].shift()
+    nodes['上一节点'] = previous['审批节点名称'].astype(object).fillna(START_NODE)
+    wait = (nodes['单个节点审批到达时间'] - previous['单个节点审批结束时间']).dt.total_seconds() / DAY_SECONDS
+    nodes['交接等待时长（天）'] = wait.clip(lower=0)
+    return nodes
+
+def instance_report(nodes, calendar=None):
+    """
+    每个流程实例一行：节点数、发起时间、最后结束时间、端到端自然时长、各节点工作时长合计；
+    传入工作日历时另算端到端工作时长（剔除节假日及周末）
+    """
+    instances = nodes.groupby(INSTANCE_COLUMN, sort=False).agg(
+        流程名称=('流程名称', 'first'),
+        节点数=('审批节点名称', 'size'),
+        发起时间=('单个节点审批到达时间', 'min'),
+        结束时间=('单个节点审批结束时间', 'max'),
+        节点工作时长合计=('该节点审批工作时长', 'sum'),
+    )
+    instances['端到端自然时长（天）'] = (instances['结束时间'] - instances['发起时间']).dt.total_seconds() / DAY_SECONDS
+    if calendar is not None:
+        instances['端到端工作时长（天）'] = calendar.work_durations(instances['发起时间'], instances['结束时间'])
+    numeric_columns = instances.select_dtypes('number').columns
+    instances[numeric_columns] = instances[numeric_columns].round(2)
+    return instances.reset_index()
+
+def transition_report(nodes):
+    """
+    按（流程名称, 上一节点, 审批节点名称）统计流转次数、交接等待时长及本节点工作时长，
+    每个流程内按等待时长合计从大到小排列，排在前面的交接造成的延误最多
+    """
+    transitions = nodes.groupby(['流程名称', '上一节点', '审批节点名称'], sort=False).agg(
+        流转次数=('审批节点名称', 'size'),
+        等待时长合计=('交接等待时长（天）', 'sum'),
+        平均等待时长=('交接等待时长（天）', 'mean'),
+        最长等待时长=('交接等待时长（天）', 'max'),
+        本节点平均工作时长=('该节点审批工作时长', 'mean'),
+    ).reset_index()
+    transitions = transitions.sort_values(['流程名称', '等待时长合计'], ascending=[True, False], kind='stable')
+    return transitions.reset_index(drop=True).round(2)
+
+def generate_flow_reports(merged_data, calendar=None):
+    """生成流程实例及节点流转分析，缺少流程实例列时跳过"""
+    if INSTANCE_COLUMN not in merged_data.columns:
+        print(f"警告: 缺少'{INSTANCE_COLUMN}'列，跳过流程实例分析")
+        return {}
+    nodes = instance_nodes(merged_data)
+    return {
+        '流程实例': instance_report(nodes, calendar),
+        '节点流转': transition_report(nodes),
+    }
+
+def generate_report_1(merged_data):
+    """生成第一个汇总报告：按审批人所在体系分组统计"""
+    # 确保分组列存在
+    if '审批人所在体系' not in merged_data.columns:
+        raise ValueError("数据中缺少'审批人所在体系'列")
+    partial = report_partial(merged_data, ['审批人所在体系'])
+    return finalize_report([partial], '审批人所在体系')
+
+def read_sheet_cached(file_path, sheet_name):
+    """读取sheet并缓存解析结果，文件路径、修改时间和大小都不变时直接读缓存"""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{sheet_name}|{stat.st_mtime_ns}|{stat.st_size}"
+    cache_path = os.path.join(REFERENCE_CACHE_DIR, hashlib.md5(key.encode('utf-8')).hexdigest() + '.pkl')
+    if os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+
+    df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+    os.makedirs(REFERENCE_CACHE_DIR, exist_ok=True)
+    df.to_pickle(cache_path)
+    return df
+
+def load_reference_data(input_file_path, staff_file_path=STAFF_FILE_PATH):
+    """读取附表：人员、假期、特殊节点合理时长"""
+    staff_df = read_sheet_cached(staff_file_path or input_file_path, "附1 最新在职人员及所属组织清单")
+    holiday_df = read_sheet_cached(input_file_path, "附2 方太春节假期")
+    special_node_df = read_sheet_cached(input_file_path, "附3特殊节点合理时长")
+
+    # 1. 人员维表：以员工工号为索引（工号重复时以最后一条为准）
+    staff_table = (
+        staff_df.drop_duplicates('员工工号', keep='last')
+        .set_index('员工工号')[list(STAFF_COLUMNS)]
+        .rename(columns=STAFF_COLUMNS)
+    )
+
     # 3. 处理假期日期
-    holidays = [datetime.strptime(str(date).strip(), '%Y-%m-%d %H:%M:%S').date() for date in holiday_df['方太假期']]
-    
+    calendar = WorkCalendar.from_frame(holiday_df, '方太假期')
+    holidays = calendar.holidays.tolist()
+
+    # 7. 特殊节点维表：以流程名称为索引的建议时长
+    node_durations = (
+        special_node_df.drop_duplicates('流程名称', keep='last')
+        .set_index('流程名称')['建议合理时长（天）']
+    )
+
+    return {
+        'staff_table': staff_table,
+        'holidays': holidays,
+        'calendar': calendar,
+        'node_durations': node_durations,
+        'node_duration_map': node_durations.to_dict()
+    }
+
+def round_clip(values):
+    """规整时长：保留2位小数，小于0（含 -0.0）或缺失时设为0，舍入结果与内置 round 一致"""
+    rounded = values.round(2)
+    # 百分位恰在 .5 附近（如 36分钟 = 0.025天）时 numpy 与内置 round 的舍入可能不同，这些值逐个按 round 计算
+    near_half = ((values * 100) % 1 - 0.5).abs() < 1e-6
+    if near_half.any():
+        rounded[near_half] = values[near_half].map(lambda x: round(x, 2))
+    return rounded.where(rounded > 0, 0.0)
+
+def duration_bucket(values):
+    """按1，2，3天分级，返回有序 category"""
+    return pd.cut(values, bins=BUCKET_BINS, labels=BUCKET_LABELS)
+
+def compact_dtypes(df):
+    """维度列转 category，FLOAT32_COLUMNS 中的浮点列、整数列降精度"""
+    for column in DIMENSION_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in df.select_dtypes(include='float').columns.intersection(FLOAT32_COLUMNS):
+        df[column] = df[column].astype('float32')
+    for column in df.select_dtypes(include='integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+def prepare_export(merged_data):
+    """
+    导出前补齐紧凑模式未保存的列，列与普通模式一致；普通模式的数据原样返回
+    """
+    merged_data = merged_data.drop(columns=[RECORD_KEY_COLUMN, ROW_HASH_COLUMN], errors='ignore')
+    if '该节点审批工作时长_规整' in merged_data.columns:
+        return merged_data
+
+    export_df = merged_data.copy()
+    # float32 转回 float64 时保留6位小数，避免写出多余的尾数
+    for column in export_df.select_dtypes(include='float32').columns:
+        export_df[column] = export_df[column].astype(float).round(6)
+
+    work_duration = export_df['该节点审批工作时长']
+    export_df.insert(
+        export_df.columns.get_loc('该节点审批工作时长') + 1,
+        '该节点审批工作时长_规整',
+        round_clip(work_duration)
+    )
+    delay_column = '节点审批延期时长(实际工作时长-节点审批时长）'
+    export_df[delay_column] = round_clip(export_df[delay_column])
+    return export_df
+
+def node_duration(base_df, reference):
+    """按流程名称从特殊节点维表取建议合理时长，未配置的流程默认为1天"""
+    return reference['node_durations'].reindex(base_df['流程名称'], fill_value=1).to_numpy()
+
+def enrich_approval_data(base_df, reference, compact=False):
+    """
+    为主表（或主表的一块）补充人员信息、计算时长及各项分级
+    compact=True 时分级用 pd.cut 生成 category，不保存规整列，延期时长保存未截断的值，
+    导出前用 prepare_export 补齐
+    """
+    # 2. 按审批人工号一次性从人员维表取出全部人员信息
+    staff = reference['staff_table'].reindex(base_df['审批人工号'])
+    for column in staff.columns:
+        base_df[column] = staff[column].to_numpy()
+
     # 4. 计算自然时长和工作时长
     base_df['单个节点审批到达时间'] = pd.to_datetime(base_df['单个节点审批到达时间'])
     base_df['单个节点审批结束时间'] = pd.to_datetime(base_df['单个节点审批结束时间'])
-    
+
     base_df['该节点审批自然时长'] = (base_df['单个节点审批结束时间'] - base_df['单个节点审批到达时间']).dt.total_seconds() / (24 * 3600)
-    
-    base_df['该节点审批工作时长'] = base_df.apply(
-        lambda row: calculate_work_duration(
-            row['单个节点审批到达时间'], 
-            row['单个节点审批结束时间'], 
-            holidays
-        ), 
-        axis=1
+
+    base_df['该节点审批工作时长'] = calculate_work_durations(
+        base_df['单个节点审批到达时间'],
+        base_df['单个节点审批结束时间'],
+        reference['calendar']
     )
-    
+    # 未办结（结束时间为空）的节点工作时长记为0，与逐日累加的原逻辑一致
+    base_df['该节点审批工作时长'] = base_df['该节点审批工作时长'].fillna(0)
+
+    if compact:
+        # 6. 分级按规整后（保留2位小数，小于0时设为0）的工作时长判断
+        base_df['节点审批时效情况：≤1；1<X≤2；2<X≤3；>3'] = duration_bucket(
+            round_clip(base_df['该节点审批工作时长'])
+        )
+        # 8. 匹配节点合理审批时长，默认值为1
+        base_df['节点审批时长'] = node_duration(base_df, reference)
+        # 9. 计算节点审批延期时长（截断到0的值导出时再计算）
+        base_df['节点审批延期时长(实际工作时长-节点审批时长）'] = base_df['该节点审批工作时长'] - base_df['节点审批时长']
+        # 10. 判断节点审批延期时长情况
+        base_df['延期时长情况：≤1；1<X≤2；2<X≤3；>3'] = duration_bucket(
+            round_clip(base_df['节点审批延期时长(实际工作时长-节点审批时长）'])
+        )
+        return compact_dtypes(base_df)
+
     # 5. 规整工作时长（保留2位小数），小于0时设为0
-    base_df['该节点审批工作时长_规整'] = base_df['该节点审批工作时长'].apply(lambda x: max(0, round(x, 2)))
-    
+    base_df['该节点审批工作时长_规整'] = round_clip(base_df['该节点审批工作时长'])
+
     #6.判断节点审批时效情况，按照1，2，3天分为3级
     base_df['节点审批时效情况：≤1；1<X≤2；2<X≤3；>3'] = base_df['该节点审批工作时长_规整'].apply(
         lambda x: '≤1' if x <= 1 else ('1<X≤2' if 1 < x <= 2 else ('2<X≤3' if 2 < x <= 3 else '>3'))
     )
 
-    # 7. 创建流程名称与建议时长的对照关系
-    node_duration_map = dict(zip(
-        special_node_df['流程名称'],
-        special_node_df['建议合理时长（天）']
-    ))
-    
     # 8. 匹配节点合理审批时长，默认值为1
-    base_df['节点审批时长'] = base_df['流程名称'].map(lambda x: node_duration_map.get(x, 1))
+    base_df['节点审批时长'] = node_duration(base_df, reference)
 
     # 9. 计算节点审批延期时长
     base_df['节点审批延期时长(实际工作时长-节点审批时长）'] = base_df['该节点审批工作时长'] - base_df['节点审批时长']
-    base_df['节点审批延期时长(实际工作时长-节点审批时长）'] = base_df['节点审批延期时长(实际工作时长-节点审批时长）'].apply(lambda x: max(0, round(x, 2)))
+    base_df['节点审批延期时长(实际工作时长-节点审批时长）'] = round_clip(base_df['节点审批延期时长(实际工作时长-节点审批时长）'])
     # 10. 判断节点审批延期时长情况，按照1，2，3天分为3级
     base_df['延期时长情况：≤1；1<X≤2；2<X≤3；>3'] = base_df['节点审批延期时长(实际工作时长-节点审批时长）'].apply(
         lambda x: '≤1' if x <= 1 else ('1<X≤2' if 1 < x <= 2 else ('2<X≤3' if 2 < x <= 3 else '>3'))
     )
 
+    return base_df
+
+def enrich_with_progress(base_df, reference, compact, progress):
+    """按 CHUNKSIZE 行分块计算，每块前后回调进度；各行计算互不依赖，结果与整表计算一致"""
+    total = len(base_df)
+    if total == 0:
+        return enrich_approval_data(base_df, reference, compact)
+
+    blocks = []
+    for start in range(0, total, CHUNKSIZE):
+        progress('计算时长', start, total)
+        block = base_df.iloc[start:start + CHUNKSIZE].copy()
+        blocks.append(enrich_approval_data(block, reference, compact))
+    progress('计算时长', total, total)
+
+    merged_data = pd.concat(blocks)
+    # 各块的 category 取值不同，拼接后会退回 object，重新转换一次
+    return compact_dtypes(merged_data) if compact else merged_data
+
+def process_approval_data(input_file_path=INPUT_FILE_PATH, compact=COMPACT_MODE, progress=None):
+    """
+    :param progress: 可选的进度回调 progress(阶段, 已完成, 总数)，传入时分块计算并逐块回调；
+                     回调中抛出异常即可中止处理
+    """
+    # 读取四个Excel文件
+    if progress:
+        progress('读取主表', 0, 1)
+    base_df = pd.read_excel(input_file_path, sheet_name="主表", engine='openpyxl')
+    if progress:
+        progress('加载参考数据', 0, 1)
+    reference = load_reference_data(input_file_path)
+
+    if progress:
+        base_df = enrich_with_progress(base_df, reference, compact, progress)
+    else:
+        base_df = enrich_approval_data(base_df, reference, compact)
+
     # 返回处理结果
     return {
         'merged_data': base_df,
-        'holiday_dates': holidays,
-        'node_duration_map': node_duration_map
+        'cube': build_cube(base_df),
+        'calendar': reference['calendar'],
+        'holiday_dates': reference['holidays'],
+        'node_duration_map': reference['node_duration_map']
     }
 
-if __name__ == '__main__':
-    result = process_approval_data()
-    print("数据处理完成")
-    print("春节假期日期:", result['holiday_dates'])
-    print("流程名称与时长对照:", result['node_duration_map'])
-    print("处理后的数据的列名:")
-    print(result['merged_data'].columns)
-    merged_data = result['merged_data']
-    merged_data.to_excel(r'C:\Users\zhangbon\Desktop\审批结果1.xlsx', index=False)
-    print("处理后的数据已保存到审批结果1.xlsx")
-    # 生成报告1
-    report1 = generate_report_1(result['merged_data'])
-    
-    # 将结果保存到Excel，包含多个sheet
-    with pd.ExcelWriter(r'C:\Users\zhangbon\Desktop\审批结果.xlsx') as writer:
-        result['merged_data'].to_excel(writer, sheet_name='原始数据', index=False)
-        report1.to_excel(writer, sheet_name='按体系汇总', index=False)
-    
-    print("报告已生成并保存到审批结果.xlsx")
+def reference_fingerprint(reference):
+    """参考数据（人员维表、特殊节点时长、工作日历）的指纹，任一附表内容或日历规则变化时指纹随之变化"""
+    digest = hashlib.md5()
+    for table in (reference['staff_table'], reference['node_durations']):
+        digest.update(pd.util.hash_pandas_object(table).to_numpy().tobytes())
+    # 日历指纹包含假期、调休上班日、工作日掩码、班次模板及计算口径版本
+    digest.update(reference['calendar'].fingerprint().encode('utf-8'))
+    return np.uint64(int.from_bytes(digest.digest()[:8], 'little'))
+
+def process_approval_data_incremental(input_file_path, store_file_path=STORE_FILE_PATH, compact=COMPACT_MODE):
+    """
+    增量处理：主表按 RECORD_KEY_COLUMNS 识别记录，与结果库比对原始行内容哈希，
+    只对新增或有变化的记录计算时长，合并进结果库；汇总报告由结果库旁保存的立方体得到，
+    立方体只加上新记录、减去被替换记录的度量，不再扫描全部历史结果。
+    行哈希中混入参考数据的指纹，附表变化时全部记录重新计算；
+    库中的记录只在被当前主表取代时删除：记录键相同而内容有变化，或到达时间落在当前主表的
+    到达时间范围内却已不在主表中（如审批人改派、到达时间更正）；范围外的历史记录
+    （如跨季度流程实例在上一季度导出中的节点）保留
+    """
+    base_df = pd.read_excel(input_file_path, sheet_name="主表", engine='openpyxl')
+    missing_cols = [col for col in RECORD_KEY_COLUMNS if col not in base_df.columns]
+    if missing_cols:
+        raise ValueError(f"主表中缺少记录键列: {missing_cols}")
+    reference = load_reference_data(input_file_path)
+
+    # 在计算前对原始内容取哈希，同一记录内容及参考数据都未变时两次运行哈希一致
+    base_df[RECORD_KEY_COLUMN] = pd.util.hash_pandas_object(base_df[RECORD_KEY_COLUMNS], index=False).to_numpy()
+    base_df[ROW_HASH_COLUMN] = pd.util.hash_pandas_object(
+        base_df.drop(columns=[RECORD_KEY_COLUMN]), index=False
+    ).to_numpy() ^ reference_fingerprint(reference)
+    base_df = base_df.drop_duplicates(RECORD_KEY_COLUMN, keep='last')
+
+    cube_path = cube_path_for(store_file_path)
+    removed = None
+    if os.path.exists(store_file_path):
+        stored = pd.read_parquet(store_file_path)
+        arrival = pd.to_datetime(base_df['单个节点审批到达时间'])
+        covered = (
+            stored[RECORD_KEY_COLUMN].isin(base_df[RECORD_KEY_COLUMN])
+            | pd.to_datetime(stored['单个节点审批到达时间']).between(arrival.min(), arrival.max())
+        )
+        # 被当前主表覆盖的记录只保留内容未变的，其余历史记录原样保留
+        kept = ~covered | stored[ROW_HASH_COLUMN].isin(base_df[ROW_HASH_COLUMN])
+        removed = stored[~kept]
+        stored = stored[kept]
+        delta = base_df[~base_df[ROW_HASH_COLUMN].isin(stored[ROW_HASH_COLUMN])]
+    else:
+        stored = None
+        delta = base_df
+    print(f"主表共 {len(base_df)} 条记录，其中新增或变化 {len(delta)} 条")
+
+    frames = [] if stored is None else [stored]
+    enriched = None
+    if len(delta):
+        enriched = enrich_approval_data(delta.copy(), reference, compact)
+        frames.append(enriched)
+    merged_data = pd.concat(frames, ignore_index=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(store_file_path)), exist_ok=True)
+    merged_data.to_parquet(store_file_path, index=False)
 
+    # 立方体：已有且维度未变时增量更新，否则（首次运行、旧版结果库）由全部结果生成一次
+    cube = None
+    if stored is not None and os.path.exists(cube_path):
+        cube = load_cube(cube_path)
+        if list(cube.index.names) != cube_dimensions(merged_data):
+            cube = None
+    if cube is None:
+        cube = build_cube(merged_data)
+    else:
+        added = [] if enriched is None else [build_cube(enriched)]
+        replaced = [build_cube(removed)] if len(removed) else []
+        cube = merge_cubes([cube] + added, replaced)
+    save_cube(cube, cube_path)
+
+    return {
+        'merged_data': merged_data,
+        'reports': build_reports([cube], available_dimensions(merged_data)),
+        'cube': cube,
+        'delta_count': len(delta),
+        'holiday_dates': reference['holidays'],
+        'node_duration_map': reference['node_duration_map']
+    }
+
+def iter_excel_chunks(file_path, sheet_name, chunksize=CHUNKSIZE):
+    """
+    以只读方式逐行读取sheet，每 chunksize 行生成一个DataFrame
+    与 pd.read_excel 一致：中间的空行保留，末尾的空行（如设置过格式的空白区域）丢弃；
+    只有表头没有数据时生成一个只有列名的空DataFrame，调用方照常得到各列
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows))
+        buffer = []
+        # 连续的空行先暂存，后面还有数据行时才算作记录
+        blank_rows = []
+        yielded = False
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows.append(row)
+                continue
+            buffer.extend(blank_rows)
+            blank_rows = []
+            buffer.append(row)
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+                yielded = True
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+def append_frame(sheet, df):
+    """把DataFrame逐行追加到只写模式的sheet中（空值写为空单元格）"""
+    for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+        sheet.append(list(row))
+
+def process_approval_data_chunked(input_file_path, output_file_path, chunksize=CHUNKSIZE, compact=COMPACT_MODE):
+    """
+    分块处理：主表每次只读入 chunksize 行，计算后立即追加写入输出文件，
+    各块的立方体合并后保存在输出文件旁边，各汇总报告由它上卷得到，与整表处理的结果一致
+    """
+    reference = load_reference_data(input_file_path)
+
+    workbook = Workbook(write_only=True)
+    data_sheet = workbook.create_sheet('原始数据')
+    cubes = []
+    dimensions = None
+    row_count = 0
+
+    for chunk in iter_excel_chunks(input_file_path, "主表", chunksize):
+        chunk = enrich_approval_data(chunk, reference, compact)
+        export_chunk = prepare_export(chunk)
+        if row_count == 0:
+            data_sheet.append(list(export_chunk.columns))
+            dimensions = available_dimensions(chunk)
+        append_frame(data_sheet, export_chunk)
+        cubes.append(build_cube(chunk))
+        row_count += len(chunk)
+        print(f"已处理 {row_count} 行")
+
+    cube = merge_cubes(cubes)
+    save_cube(cube, cube_path_for(output_file_path))
+    reports = build_reports([cube], dimensions)
+    for sheet_name, report in reports.items():
+        report_sheet = workbook.create_sheet(sheet_name)
+        report_sheet.append(list(report.columns))
+        append_frame(report_sheet, report)
+    workbook.save(output_file_path)
+
+    return {
+        'reports': reports,
+        'cube': cube,
+        'row_count': row_count,
+        'holiday_dates': reference['holidays'],
+        'node_duration_map': reference['node_duration_map']
+    }
+
+if __name__ == '__main__':
+    if CHUNKED_MODE:
+        result = process_approval_data_chunked(INPUT_FILE_PATH, OUTPUT_FILE_PATH)
+        print(f"共处理 {result['row_count']} 行，报告已生成并保存到审批结果.xlsx")
+    elif INCREMENTAL_MODE:
+        result = process_approval_data_incremental(INPUT_FILE_PATH)
+        with pd.ExcelWriter(OUTPUT_FILE_PATH) as writer:
+            prepare_export(result['merged_data']).to_excel(writer, sheet_name='原始数据', index=False)
+            for sheet_name, report in result['reports'].items():
+                report.to_excel(writer, sheet_name=sheet_name, index=False)
+        print(f"本次新计算 {result['delta_count']} 条，报告已生成并保存到审批结果.xlsx")
+    else:
+        result = process_approval_data()
+        print("数据处理完成")
+        print("春节假期日期:", result['holiday_dates'])
+        print("流程名称与时长对照:", result['node_duration_map'])
+        print("处理后的数据的列名:")
+        print(result['merged_data'].columns)
+        merged_data = prepare_export(result['merged_data'])
+        merged_data.to_excel(r'C:\Users\zhangbon\Desktop\审批结果1.xlsx', index=False)
+        print("处理后的数据已保存到审批结果1.xlsx")
+        # 生成各维度汇总报告
+        reports = generate_reports(result['merged_data'])
+        reports.update(generate_backlog_reports(result['merged_data']))
+        reports.update(generate_flow_reports(result['merged_data'], result['calendar']))
 
+        # 将结果保存到Excel，包含多个sheet
+        with pd.ExcelWriter(OUTPUT_FILE_PATH) as writer:
+            merged_data.to_excel(writer, sheet_name='原始数据', index=False)
+            for sheet_name, report in reports.items():
+                report.to_excel(writer, sheet_name=sheet_name, index=False)
+        # 汇总立方体保存在结果文件旁边，之后按任意维度组合上卷用 cube_report(立方体文件路径, 维度)
+        save_cube(result['cube'], cube_path_for(OUTPUT_FILE_PATH))
 
+        print("报告已生成并保存到审批结果.xlsx")
@@ -0,0 +1,139 @@
+"""
+审批计算性能基准
+
+用 生成测试数据.py 生成各规模的数据，逐阶段（读取主表、加载参考数据、计算时长、
+生成报告、导出Excel）记录耗时和内存峰值（两者分两遍测量），结果写成JSON；指定基线JSON时，
+耗时超过基线一定比例的阶段标记为退化，并以非0退出码结束，便于改动前后对比。
+
+用法：python 性能基准.py [--sizes 10000 100000] [--baseline 基线.json] [--output 结果.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import 审批计算
+from 生成测试数据 import generate_approval_workbook
+
+SIZES = [10_000, 100_000]
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '缓存')
+RESULT_FILE_PATH = os.path.join(DATA_DIR, '性能基准结果.json')
+
+# 耗时超过基线 20% 且多出 0.1 秒以上才算退化，避免小规模下的计时抖动
+REGRESSION_RATIO = 0.2
+REGRESSION_MIN_SECONDS = 0.1
+
+def measure_seconds(stage_results, stage, func, *args, **kwargs):
+    """执行一个阶段并记录耗时（秒）"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    stage_results[stage] = round(time.perf_counter() - started, 4)
+    return result
+
+def measure_peak_mb(stage_results, stage, func, *args, **kwargs):
+    """执行一个阶段并记录该阶段内的内存峰值（MB）"""
+    tracemalloc.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stage_results[stage] = round(peak / 1024 ** 2, 2)
+
+def write_workbook(merged_data, reports, output_path):
+    with pd.ExcelWriter(output_path) as writer:
+        审批计算.prepare_export(merged_data).to_excel(writer, sheet_name='原始数据', index=False)
+        for sheet_name, report in reports.items():
+            report.to_excel(writer, sheet_name=sheet_name, index=False)
+
+def run_stages(input_path, compact, measure):
+    """按阶段跑一遍完整流程，每个阶段用 measure 记录一项指标"""
+    stage_results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 参考数据缓存放到临时目录，每次都从Excel冷读取
+        审批计算.REFERENCE_CACHE_DIR = work_dir
+        base_df = measure(stage_results, '读取主表', pd.read_excel,
+                          input_path, sheet_name='主表', engine='openpyxl')
+        reference = measure(stage_results, '加载参考数据', 审批计算.load_reference_data, input_path)
+        merged_data = measure(stage_results, '计算时长', 审批计算.enrich_approval_data,
+                              base_df, reference, compact)
+        reports = measure(stage_results, '生成报告', 审批计算.generate_reports, merged_data)
+        measure(stage_results, '导出Excel', write_workbook,
+                merged_data, reports, os.path.join(work_dir, '审批结果.xlsx'))
+    return stage_results
+
+def benchmark_size(n_rows, compact=False, memory=True):
+    """
+    对一种规模跑完整流程，返回 {阶段: {'seconds', 'peak_mb'}}
+    tracemalloc 会明显拖慢执行，耗时和内存峰值分两遍测量；memory=False 时只测耗时
+    """
+    input_path = os.path.join(DATA_DIR, f'测试数据_{n_rows}.xlsx')
+    if not os.path.exists(input_path):
+        print(f"生成 {n_rows} 行测试数据...")
+        generate_approval_workbook(n_rows, input_path)
+
+    seconds = run_stages(input_path, compact, measure_seconds)
+    peaks = run_stages(input_path, compact, measure_peak_mb) if memory else {}
+    return {stage: {'seconds': seconds[stage], 'peak_mb': peaks.get(stage)} for stage in seconds}
+
+def find_regressions(results, baseline):
+    """与基线比较，返回退化的 (规模, 阶段, 基线耗时, 本次耗时) 列表"""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        for stage, current in stages.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(stage)
+            if previous is None:
+                continue
+            slower = current['seconds'] - previous['seconds']
+            if slower > REGRESSION_MIN_SECONDS and slower > previous['seconds'] * REGRESSION_RATIO:
+                regressions.append((size, stage, previous['seconds'], current['seconds']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='审批计算性能基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='主表行数，可指定多个')
+    parser.add_argument('--compact', action='store_true', help='使用紧凑模式计算')
+    parser.add_argument('--no-memory', action='store_true', help='不测内存峰值（省去第二遍运行）')
+    parser.add_argument('--baseline', help='基线结果JSON，指定时检查退化')
+    parser.add_argument('--output', default=RESULT_FILE_PATH, help='结果JSON输出路径')
+    args = parser.parse_args()
+
+    results = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'compact': args.compact,
+        'sizes': {},
+    }
+    for n_rows in args.sizes:
+        stages = benchmark_size(n_rows, args.compact, not args.no_memory)
+        results['sizes'][str(n_rows)] = stages
+        for stage, result in stages.items():
+            peak = '' if result['peak_mb'] is None else f"  峰值 {result['peak_mb']:>9.1f} MB"
+            print(f"{n_rows:>9} 行  {stage:<8} {result['seconds']:>9.3f} 秒{peak}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline)
+        for size, stage, before, after in regressions:
+            print(f"性能退化: {size} 行 {stage} {before:.3f} 秒 -> {after:.3f} 秒")
+        if regressions:
+            sys.exit(1)
+        print("未发现性能退化")
+
+if __name__ == '__main__':
+    main()
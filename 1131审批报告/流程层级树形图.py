@@ -3,16 +3,276 @@
 
 功能：读取Excel中的流程层级数据，绘制横向树形关系图
 
+HTML中只内嵌前 EMBED_DEPTH 级节点，更深的子树按 CHUNK_NODE_LIMIT 个节点一块
+写成 JS 数据文件（放在HTML旁的 *_数据 目录），展开节点时再加载；
+同目录下另有预先生成的节点名称索引，页面顶部的搜索框直接查索引定位节点。
+
 使用前请确保安装必要的库：
 pip install pandas pyecharts openpyxl
 """
 
+import json
+import os
+import glob
+
 import pandas as pd
 from pyecharts import options as opts
 from pyecharts.charts import Tree
 
 # 替换为实际的Excel文件路径
 EXCEL_FILE_PATH = r"C:\Users\zhangbon\Desktop\美的-内销服务架构.xlsx"
+OUTPUT_FILE = "流程层级关系图.html"
+
+LEVEL_COLUMNS = ["一级流程", "二级流程", "三级流程", "四级流程", "五级流程场景"]
+
+# HTML中内嵌的层级数，更深的子树展开时再加载
+EMBED_DEPTH = 2
+# 每个子树数据文件大致包含的节点数
+CHUNK_NODE_LIMIT = 2000
+# 子树加载前显示的占位节点
+LOADING_TEXT = "加载中..."
+CHART_ID = "flow_tree"
+
+# 页面脚本：展开时按需加载子树数据文件；搜索时查名称索引，加载所在子树后展开路径并高亮
+TREE_JS = """
+var treeChart = chart_%(chart_id)s;
+var dataDir = %(data_dir)s;
+var treeRoot = null;
+var nodeById = {};
+var loadedChunks = {};
+var pendingChunks = {};
+var searchIndex = {};
+var searchNames = [];
+var highlighted = null;
+
+function indexNodes(items) {
+    (items || []).forEach(function (item) {
+        if (item.id !== undefined) { nodeById[item.id] = item; }
+        indexNodes(item.children);
+    });
+}
+// 本段脚本在图表 setOption 之前执行，首次用到时再取出内嵌的树形数据
+function ensureTree() {
+    if (!treeRoot) {
+        treeRoot = treeChart.getOption().series[0].data;
+        indexNodes(treeRoot);
+    }
+}
+
+function refreshTree() {
+    treeChart.setOption({series: [{data: treeRoot}]});
+}
+
+function loadScript(src, onload) {
+    var script = document.createElement('script');
+    script.src = dataDir + '/' + src;
+    script.onload = onload;
+    document.head.appendChild(script);
+}
+
+// 子树数据文件加载后调用：{节点编号: 子节点列表}
+function loadSubtrees(subtrees) {
+    ensureTree();
+    Object.keys(subtrees).forEach(function (id) {
+        nodeById[id].children = subtrees[id];
+        indexNodes(subtrees[id]);
+    });
+}
+
+// 名称索引加载后调用：{节点名称: [[路径上的节点编号], 子树数据文件, 路径文本], ...}
+function registerSearchIndex(index) {
+    searchIndex = index;
+    searchNames = Object.keys(index);
+}
+
+function loadChunk(chunk, callback) {
+    if (!chunk || loadedChunks[chunk]) { callback(); return; }
+    if (pendingChunks[chunk]) { pendingChunks[chunk].push(callback); return; }
+    pendingChunks[chunk] = [callback];
+    loadScript(chunk, function () {
+        var callbacks = pendingChunks[chunk];
+        loadedChunks[chunk] = true;
+        delete pendingChunks[chunk];
+        callbacks.forEach(function (cb) { cb(); });
+    });
+}
+
+// 图表自身负责展开/收起，这里同步记录状态，刷新数据时保持展开情况
+treeChart.on('click', function (params) {
+    ensureTree();
+    var node = params.data && nodeById[params.data.id];
+    if (!node || !node.children) { return; }
+    node.collapsed = !node.collapsed;
+    if (node.chunk && !loadedChunks[node.chunk]) {
+        loadChunk(node.chunk, refreshTree);
+    }
+});
+
+function revealNode(entry) {
+    var path = entry[0];
+    ensureTree();
+    loadChunk(entry[1], function () {
+        path.slice(0, -1).forEach(function (id) { nodeById[id].collapsed = false; });
+        if (highlighted) { delete highlighted.label; }
+        highlighted = nodeById[path[path.length - 1]];
+        highlighted.label = {color: '#ee6666', fontWeight: 'bold'};
+        refreshTree();
+    });
+}
+
+function findMatches(text) {
+    var matches = (searchIndex[text] || []).slice();
+    searchNames.forEach(function (name) {
+        if (name !== text && name.indexOf(text) >= 0) {
+            matches = matches.concat(searchIndex[name]);
+        }
+    });
+    return matches.slice(0, %(max_results)d);
+}
+
+var searchBox = document.createElement('div');
+searchBox.style.margin = '10px';
+var searchInput = document.createElement('input');
+searchInput.placeholder = '搜索节点名称，回车查找';
+searchInput.style.width = '300px';
+var searchResults = document.createElement('select');
+searchResults.style.marginLeft = '10px';
+searchResults.style.maxWidth = '900px';
+searchBox.appendChild(searchInput);
+searchBox.appendChild(searchResults);
+document.body.insertBefore(searchBox, document.body.firstChild);
+
+var currentMatches = [];
+searchInput.addEventListener('keydown', function (event) {
+    if (event.key !== 'Enter') { return; }
+    var text = searchInput.value.trim();
+    currentMatches = text ? findMatches(text) : [];
+    searchResults.innerHTML = '';
+    currentMatches.forEach(function (entry, i) {
+        var option = document.createElement('option');
+        option.value = i;
+        option.textContent = entry[2];
+        searchResults.appendChild(option);
+    });
+    if (currentMatches.length) {
+        revealNode(currentMatches[0]);
+    } else if (text) {
+        var option = document.createElement('option');
+        option.textContent = '未找到匹配的节点';
+        searchResults.appendChild(option);
+    }
+});
+searchResults.addEventListener('change', function () {
+    var entry = currentMatches[searchResults.value];
+    if (entry) { revealNode(entry); }
+});
+
+loadScript('index.js');
+"""
+# 搜索结果最多显示的条数
+MAX_SEARCH_RESULTS = 50
+
+def normalize_paths(df, levels):
+    """层级列转为去空格的字符串，某一级为空时其后各级一并视为空，再去掉重复路径"""
+    paths = pd.DataFrame({
+        level: df[level].where(df[level].isna(), df[level].astype(str).str.strip())
+        for level in levels
+    })
+    paths = paths.where(paths.notna().cummin(axis=1))
+    return paths[paths[levels[0]].notna()].drop_duplicates()
+
+def build_tree_nodes(paths, levels):
+    """
+    由去重后的层级路径逐级生成节点表
+    :return: DataFrame，列为 id、parent（顶级为-1）、depth、name、path（从顶级到本节点的编号列表）；
+             按层级排列，同一父节点下的子节点保持在数据中首次出现的顺序
+    """
+    frames = []
+    # 每条路径在各级上的节点编号
+    path_ids = pd.DataFrame(index=paths.index)
+    next_id = 0
+    for depth, level in enumerate(levels):
+        paths = paths[paths[level].notna()]
+        if paths.empty:
+            break
+        path_ids = path_ids.loc[paths.index]
+
+        codes = paths.groupby(levels[:depth + 1], sort=False).ngroup().to_numpy() + next_id
+        path_ids[depth] = codes
+        first = ~pd.Series(codes).duplicated().to_numpy()
+
+        frames.append(pd.DataFrame({
+            'id': codes[first],
+            'parent': path_ids[depth - 1].to_numpy()[first] if depth else -1,
+            'depth': depth,
+            'name': paths[level].to_numpy()[first],
+            'path': path_ids.to_numpy()[first].tolist(),
+        }))
+        next_id = codes.max() + 1
+
+    if not frames:
+        return pd.DataFrame(columns=['id', 'parent', 'depth', 'name', 'path'])
+    return pd.concat(frames, ignore_index=True)
+
+def split_tree_data(nodes, embed_depth=EMBED_DEPTH, chunk_node_limit=CHUNK_NODE_LIMIT):
+    """
+    将节点表转换为pyecharts Tree所需的格式，前 embed_depth 级内嵌，更深的子树分块
+    :return: (内嵌的树形数据, {数据文件名: {节点编号: 子节点列表}}, 各节点所在数据文件 Series)
+    """
+    items = {}
+    roots = []
+    for node in nodes.itertuples(index=False):
+        item = {"name": node.name, "id": int(node.id)}
+        items[node.id] = item
+        if node.parent < 0:
+            roots.append(item)
+        else:
+            items[node.parent].setdefault("children", []).append(item)
+
+    # 内嵌部分展开显示，其余节点默认收起
+    for node in nodes.itertuples(index=False):
+        if "children" in items[node.id]:
+            items[node.id]["collapsed"] = bool(node.depth >= embed_depth - 1)
+
+    # 边界节点（内嵌的最后一级）按子树节点数依次装入数据文件
+    deep = nodes[nodes['depth'] >= embed_depth]
+    boundary_of = deep['path'].str[embed_depth - 1]
+    subtree_sizes = boundary_of.value_counts(sort=False)
+    boundary_ids = nodes.loc[nodes['id'].isin(subtree_sizes.index), 'id']
+    sizes = subtree_sizes.reindex(boundary_ids).to_numpy()
+    chunk_no = (sizes.cumsum() - sizes) // chunk_node_limit
+    chunk_of_boundary = pd.Series([f"chunk_{no}.js" for no in chunk_no], index=boundary_ids.to_numpy(), dtype=object)
+
+    chunks = {}
+    for node_id, chunk in chunk_of_boundary.items():
+        item = items[node_id]
+        chunks.setdefault(chunk, {})[str(node_id)] = item.pop("children")
+        item["children"] = [{"name": LOADING_TEXT}]
+        item["chunk"] = chunk
+
+    node_chunks = pd.Series("", index=nodes.index, dtype=object)
+    node_chunks[deep.index] = chunk_of_boundary.reindex(boundary_of.to_numpy()).to_numpy()
+    return roots, chunks, node_chunks
+
+def build_search_index(nodes, node_chunks):
+    """节点名称索引：{名称: [[路径上的节点编号], 所在数据文件, 路径文本], ...}"""
+    names = nodes.set_index('id')['name']
+    index = {}
+    for node, chunk in zip(nodes.itertuples(index=False), node_chunks):
+        path = [int(node_id) for node_id in node.path]
+        index.setdefault(node.name, []).append([path, chunk, " / ".join(names[path])])
+    return index
+
+def write_data_files(data_dir, chunks, search_index):
+    """写出子树数据文件和名称索引（JSONP 形式，本地打开HTML时也能加载）"""
+    os.makedirs(data_dir, exist_ok=True)
+    for old_file in glob.glob(os.path.join(data_dir, "chunk_*.js")):
+        os.remove(old_file)
+    for chunk, subtrees in chunks.items():
+        with open(os.path.join(data_dir, chunk), "w", encoding="utf-8") as f:
+            f.write(f"loadSubtrees({json.dumps(subtrees, ensure_ascii=False, separators=(',', ':'))});")
+    with open(os.path.join(data_dir, "index.js"), "w", encoding="utf-8") as f:
+        f.write(f"registerSearchIndex({json.dumps(search_index, ensure_ascii=False, separators=(',', ':'))});")
 
 def main():
     # 读取Excel数据
@@ -26,50 +286,31 @@ def main():
         return
 
     # 检查是否包含必要的列
-    required_columns = ["一级流程", "二级流程", "三级流程", "四级流程", "五级流程场景"]
+    required_columns = LEVEL_COLUMNS
     missing_columns = [col for col in required_columns if col not in df.columns]
     if missing_columns:
         print(f"错误：Excel文件缺少必要的列：{', '.join(missing_columns)}")
         return
 
-    # 构建树形结构数据
-    tree = {}
-    for _, row in df.iterrows():
-          current_node = tree
-          for level in required_columns:
-            value = row[level]
-            # 跳过空值
-            if pd.isna(value):
-                break
-            # 转换为字符串并去除空格
-            value_str = str(value).strip()
-            # 如果当前节点不存在该值，则创建新节点
-            if value_str not in current_node:
-                current_node[value_str] = {}
-                
-            # 移动到下一级节点
-            current_node = current_node[value_str]
-
-    # 将字典转换为pyecharts Tree所需的格式
-    def dict_to_tree_data(node_dict):
-        children = []
-        for key, value in node_dict.items():
-            if isinstance(value, dict) and value:
-                children.append({"name": key, "children": dict_to_tree_data(value)})
-            else:
-                children.append({"name": key})
-        return children
-
-    tree_data = dict_to_tree_data(tree)
+    # 先对层级路径去重，再逐级生成节点
+    nodes = build_tree_nodes(normalize_paths(df, required_columns), required_columns)
 
     # 如果树为空
-    if not tree_data:
+    if nodes.empty:
         print("错误：未从Excel数据中提取到有效层级关系。")
         return
 
+    tree_data, chunks, node_chunks = split_tree_data(nodes)
+    data_dir_name = os.path.splitext(os.path.basename(OUTPUT_FILE))[0] + "_数据"
+    write_data_files(
+        os.path.join(os.path.dirname(os.path.abspath(OUTPUT_FILE)), data_dir_name),
+        chunks,
+        build_search_index(nodes, node_chunks)
+    )
+
     # 创建Tree图表，设置横向布局
     tree_chart = (
-        Tree(init_opts=opts.InitOpts(width="1600px"))  # 增加图表宽度以扩大节点间距
+        Tree(init_opts=opts.InitOpts(width="1600px", chart_id=CHART_ID))  # 增加图表宽度以扩大节点间距
         .add(
             series_name="流程层级",
             data=tree_data,
@@ -85,12 +326,16 @@ def main():
             title_opts=opts.TitleOpts(title="流程层级关系图"),
             tooltip_opts=opts.TooltipOpts(trigger="item", trigger_on="mousemove")
         )
+        .add_js_funcs(TREE_JS % {
+            "chart_id": CHART_ID,
+            "data_dir": json.dumps(data_dir_name, ensure_ascii=False),
+            "max_results": MAX_SEARCH_RESULTS,
+        })
     )
 
     # 渲染为HTML文件
-    output_file = "流程层级关系图.html"
-    tree_chart.render(output_file)
-    print(f"树形图已成功生成：{output_file}")
+    tree_chart.render(OUTPUT_FILE)
+    print(f"树形图已成功生成：{OUTPUT_FILE}（子树数据：{data_dir_name}，共 {len(nodes)} 个节点）")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
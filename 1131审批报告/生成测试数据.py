@@ -0,0 +1,154 @@
+"""
+生成审批测试数据
+
+按 审批计算.py 要求的sheet结构生成模拟数据：主表、附1 最新在职人员及所属组织清单、
+附2 方太春节假期、附3特殊节点合理时长。主表按流程实例生成前后相接的节点，
+到达时间覆盖春节、清明、五一等假期及周末，节点时长包含当日办结和跨多天的长尾，
+可用于性能基准（性能基准.py）及改动前后的结果核对。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from work_time_utils import WorkCalendar
+
+# 常用规模
+SIZES = [10_000, 100_000, 1_000_000]
+
+# 数据覆盖的时间段
+PERIOD_START = pd.Timestamp('2025-01-02')
+PERIOD_DAYS = 150
+
+# 假期及调休上班日（与 附2 方太春节假期 的格式一致）
+HOLIDAYS = (
+    list(pd.date_range('2025-01-28', '2025-02-04'))
+    + list(pd.date_range('2025-04-04', '2025-04-06'))
+    + list(pd.date_range('2025-05-01', '2025-05-05'))
+)
+MAKEUP_DAYS = [pd.Timestamp('2025-01-26'), pd.Timestamp('2025-02-08'), pd.Timestamp('2025-04-27')]
+
+STAFF_COUNT = 2000
+SYSTEM_COUNT = 8
+ORG_COUNT = 30
+PROCESS_COUNT = 40
+NODES_PER_PROCESS = 6
+SPECIAL_PROCESS_COUNT = 10
+# 主表中不在人员清单里的审批人（离职等）比例
+UNKNOWN_STAFF_RATE = 0.02
+# 流程末节点尚未审批完成（结束时间为空）的比例
+PENDING_RATE = 0.05
+
+def staff_sheet(rng):
+    """附1：人员清单"""
+    return pd.DataFrame({
+        '员工工号': [f'F{i:06d}' for i in range(STAFF_COUNT)],
+        '姓名': [f'员工{i}' for i in range(STAFF_COUNT)],
+        '审批人所在体系': [f'体系{i}' for i in rng.integers(0, SYSTEM_COUNT, STAFF_COUNT)],
+        '一级组织名称': [f'一级组织{i}' for i in rng.integers(0, ORG_COUNT, STAFF_COUNT)],
+    })
+
+def holiday_sheet():
+    """附2：假期清单，调休上班日单独一列"""
+    holiday_df = pd.DataFrame({'方太假期': [day.strftime('%Y-%m-%d %H:%M:%S') for day in HOLIDAYS]})
+    holiday_df['调休上班日'] = pd.Series(MAKEUP_DAYS)
+    return holiday_df
+
+def special_node_sheet(rng):
+    """附3：特殊节点合理时长"""
+    processes = rng.choice(PROCESS_COUNT, SPECIAL_PROCESS_COUNT, replace=False)
+    return pd.DataFrame({
+        '流程名称': [f'流程{i}' for i in processes],
+        '建议合理时长（天）': rng.integers(2, 6, SPECIAL_PROCESS_COUNT),
+    })
+
+def node_durations(rng, n_rows):
+    """
+    节点时长（秒）：一半当日办结，三成多跨1~3天（含跨周末、跨假期），其余为长尾
+    """
+    kind = rng.random(n_rows)
+    hours = np.where(
+        kind < 0.5, rng.exponential(3, n_rows),
+        np.where(kind < 0.85, rng.uniform(24, 72, n_rows), rng.lognormal(np.log(96), 0.8, n_rows))
+    )
+    return (hours * 3600).astype(np.int64)
+
+def main_sheet(rng, n_rows, calendar):
+    """主表：按流程实例生成前后相接的审批节点"""
+    # 每个流程实例 1~8 个节点
+    node_counts = rng.integers(1, 9, n_rows // 2 + 1)
+    node_counts = node_counts[:np.searchsorted(np.cumsum(node_counts), n_rows) + 1]
+    instance_ids = np.repeat(np.arange(len(node_counts)), node_counts)[:n_rows]
+    position = pd.Series(instance_ids).groupby(instance_ids).cumcount().to_numpy()
+    is_last = np.r_[instance_ids[1:] != instance_ids[:-1], True]
+
+    # 流程发起时间：七成在工作时段 8:30~18:00，其余全天随机
+    start_day = rng.integers(0, PERIOD_DAYS, len(node_counts))
+    office = rng.random(len(node_counts)) < 0.7
+    start_second = np.where(office, rng.integers(8 * 3600 + 1800, 18 * 3600, len(node_counts)),
+                            rng.integers(0, 24 * 3600, len(node_counts)))
+    instance_start = PERIOD_START + pd.to_timedelta(start_day * 86400 + start_second, unit='s')
+
+    # 上一节点结束即下一节点到达
+    durations = node_durations(rng, n_rows)
+    elapsed_before = pd.Series(durations).groupby(instance_ids).cumsum().to_numpy() - durations
+    arrival = instance_start[instance_ids] + pd.to_timedelta(elapsed_before, unit='s')
+    end = pd.Series(arrival + pd.to_timedelta(durations, unit='s'))
+    end[is_last & (rng.random(n_rows) < PENDING_RATE)] = pd.NaT
+
+    process = rng.integers(0, PROCESS_COUNT, len(node_counts))[instance_ids]
+    staff_no = rng.integers(0, STAFF_COUNT, n_rows)
+    unknown = rng.random(n_rows) < UNKNOWN_STAFF_RATE
+
+    base_df = pd.DataFrame({
+        '流程实例ID': [f'PI{i:08d}' for i in instance_ids],
+        '流程名称': [f'流程{i}' for i in process],
+        '审批节点名称': [f'节点{i}' for i in position % NODES_PER_PROCESS],
+        '审批人工号': np.where(unknown, [f'X{i:06d}' for i in staff_no], [f'F{i:06d}' for i in staff_no]),
+        '单个节点审批到达时间': arrival,
+        '单个节点审批结束时间': end,
+    })
+
+    # 源系统导出的时效列：自然时长及剔除节假日、周末后的工作时长
+    natural_days = (base_df['单个节点审批结束时间'] - base_df['单个节点审批到达时间']).dt.total_seconds() / 86400
+    work_days = calendar.work_durations(base_df['单个节点审批到达时间'], base_df['单个节点审批结束时间'])
+    base_df['节点审批时效情况（≤1；＞1）'] = np.where(work_days <= 1, '<=1', np.where(work_days > 1, '>1', None))
+    base_df['节点审批时效是否大于3天'] = np.where(work_days > 3, 'Y', 'N')
+    base_df['该节点审批自然时长（单位：天）'] = natural_days.round(3)
+    base_df['该节点审批工作时长（单位：天）——剔除节假日及周末，按24小时计算'] = np.round(work_days, 3)
+    return base_df
+
+def generate_approval_tables(n_rows, seed=0):
+    """
+    生成审批测试数据
+    :param n_rows: 主表行数
+    :param seed: 随机种子，相同种子生成的数据完全一致
+    :return: {sheet名: DataFrame}
+    """
+    rng = np.random.default_rng(seed)
+    holiday_df = holiday_sheet()
+    calendar = WorkCalendar.from_frame(holiday_df, '方太假期')
+    return {
+        '主表': main_sheet(rng, n_rows, calendar),
+        '附1 最新在职人员及所属组织清单': staff_sheet(rng),
+        '附2 方太春节假期': holiday_df,
+        '附3特殊节点合理时长': special_node_sheet(rng),
+    }
+
+def generate_approval_workbook(n_rows, output_path, seed=0):
+    """生成测试数据并写出为 审批计算.py 可直接读取的Excel文件"""
+    tables = generate_approval_tables(n_rows, seed)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with pd.ExcelWriter(output_path) as writer:
+        for sheet_name, df in tables.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return output_path
+
+if __name__ == '__main__':
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '缓存')
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    for size in sizes:
+        path = generate_approval_workbook(size, os.path.join(output_dir, f'测试数据_{size}.xlsx'))
+        print(f"已生成 {size} 行测试数据: {path}")
@@ -1,91 +1,122 @@
+import argparse
 import pandas as pd
 import numpy as np
 from scipy import stats
 import openpyxl
-from datetime import datetime, timedelta
+from work_time_utils import WorkCalendar, calculate_work_durations, ALL_DAYS
+from time_parse_utils import parse_timestamps
+from quantile_sketch import build_group_sketches, merge_sketch_sets, save_sketches, load_sketches
 import warnings
 warnings.filterwarnings("ignore")
 
-def calculate_work_duration(start_time, end_time, holidays):
-    # 确保输入是datetime类型
-    def parse_time(time_str):
-        if isinstance(time_str, str):
-            try:
-                return datetime.strptime(time_str, '%Y/%m/%d %H:%M:%S')
-            except ValueError:
-                try:
-                    return datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    try:
-                        return datetime.strptime(time_str, '%Y/%m/%d')
-                    except ValueError:
-                        return datetime.strptime(time_str, '%Y-%m-%d')
-        return time_str
-    
-    start_time = parse_time(start_time)
-    end_time = parse_time(end_time)
-    
-    current = start_time
-    work_duration = timedelta()
-    
-    while current < end_time:
-        next_day = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0)
-        if current.date() not in holidays:
-            work_duration += min(next_day, end_time) - current
-        current = next_day
-    
-    return work_duration.total_seconds() / (24 * 3600)  # 转换为天数
-
-def analyze_approval_duration(df, group_field1, group_field2):
+# 导出文件中可能出现的时间格式，按优先级排列
+TIME_FORMATS = ['%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d', '%Y-%m-%d']
+
+# 分位数（按输出列顺序）与置信区间的置信水平
+QUANTILES = [0.95, 0.90, 0.80]
+CONFIDENCE_LEVELS = [0.60, 0.80, 0.90, 0.95]
+
+# 近似分位数：按（流程名称, 审批节点名称）保存可合并的分位数草图，
+# 各季度的草图文件合并后即可得到全年分位数，不必重新读取全部明细
+USE_SKETCHES = False
+SKETCH_SUFFIX = '-时长草图.pkl'
+# 需要合并的各季度草图文件，非空时（或命令行传 --merge）合并输出全年分析结果，不再做季度分析
+YEAR_SKETCH_PATHS = []
+
+HOLIDAY_FILE_PATH = r"C:\Users\zhangbon\Desktop\临时活\1131统计\计算节点合理时长\2025-方太非工作日清单.xlsx"
+IN_PATH = r"C:\Users\zhangbon\Desktop\临时活\1131统计\计算节点合理时长\24年数据分析-0603\24年数据分析-0603\Q1-五个一和PBC审批流程(1).xlsx"
+YEAR_RESULT_PATH = IN_PATH.replace(".xlsx", "-全年结果分析稿.xlsx")
+
+def grouped_quantiles(values, group_codes, n_groups, quantiles):
+    """
+    每组只排序一次，按线性插值（与 Series.quantile 默认方式一致）读取任意多个分位数
+    :param values: 数值数组
+    :param group_codes: 每个值所属分组编号（0 ~ n_groups-1，-1 表示不参与）
+    :return: {分位数: 各组分位值数组}，组内无有效值时为 NaN
+    """
+    mask = (group_codes >= 0) & ~np.isnan(values)
+    codes = group_codes[mask]
+    values = values[mask]
+
+    # 先按组、再按值一次性排序，各组的值在数组中连续且有序
+    order = np.lexsort((values, codes))
+    values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    if not len(values):
+        return {q: np.full(n_groups, np.nan) for q in quantiles}
+
+    result = {}
+    has_values = counts > 0
+    for q in quantiles:
+        position = (counts - 1) * q
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        lower_value = values[np.where(has_values, starts + lower, 0)]
+        upper_value = values[np.where(has_values, starts + upper, 0)]
+        quantile = lower_value + (position - lower) * (upper_value - lower_value)
+        result[q] = np.where(has_values, quantile, np.nan)
+    return result
+
+def add_confidence_intervals(grouped, confidence_levels):
+    """计算置信区间：所有组、所有置信水平一次性按 t 分布数组计算"""
+    count = grouped['count'].to_numpy(dtype=float)
+    valid = (count > 1) & grouped['std'].notna().to_numpy()
+    dof = np.where(valid, count - 1, 1)
+    standard_error = grouped['std'].to_numpy() / np.sqrt(count)
+    for confidence in confidence_levels:
+        margin = stats.t.ppf((1 + confidence) / 2, dof) * standard_error
+        grouped[f'{confidence:.0%}_CI_lower'] = np.where(valid, grouped['mean'] - margin, np.nan)
+        grouped[f'{confidence:.0%}_CI_upper'] = np.where(valid, grouped['mean'] + margin, np.nan)
+    return grouped
+
+def summarize_sketches(sketches, group_field1, group_field2, confidence_levels=None):
+    """由分组草图生成与 analyze_approval_duration 相同列的统计结果（分位数为近似值）"""
+    rows = []
+    for (value1, value2), sketch in sorted(sketches.items()):
+        rows.append([value1, value2, sketch.count, sketch.mean, sketch.std, *sketch.quantile(QUANTILES)])
+    grouped = pd.DataFrame(
+        rows,
+        columns=[group_field1, group_field2, 'count', 'mean', 'std'] + [f'{q:.0%}分位' for q in QUANTILES]
+    )
+    if confidence_levels:
+        grouped = add_confidence_intervals(grouped, confidence_levels)
+    return grouped
+
+def analyze_approval_duration(df, group_field1, group_field2, confidence_levels=None, approximate=False, sketches=None):
     """
     对审批时长进行分组统计和置信度分析
     :param df: 包含审批数据的DataFrame
     :param group_field1: 第一个分组字段名
     :param group_field2: 第二个分组字段名
+    :param confidence_levels: 需要输出置信区间的置信水平列表（如 CONFIDENCE_LEVELS），默认不输出
+    :param approximate: 为True时分位数由分位数草图估计（计数、均值、标准差仍为精确值）
+    :param sketches: approximate 时可传入已生成的分组草图（如同时要保存草图），避免重复生成
     :return: 包含统计结果的DataFrame
     """
-    # 分组计算计数、均值、标准差和分位数
-    grouped = df.groupby([group_field1, group_field2])['该节点审批工作时长'].agg(
-        ['count', 'mean', 'std', 
-         lambda x: x.quantile(0.95), 
-         lambda x: x.quantile(0.90),
-         lambda x: x.quantile(0.80)]
-    ).reset_index()
-    grouped = grouped.rename(columns={
-        '<lambda_0>': '95%分位',
-        '<lambda_1>': '90%分位',
-        '<lambda_2>': '80%分位'
-    })
-    
-    # 计算60%、80%、90%和95%的置信区间
-    # def calc_ci(row, confidence=0.95):
-    #     if row['count'] <= 1 or pd.isna(row['std']):
-    #         return (np.nan, np.nan)
-    #     return stats.t.interval(
-    #         confidence, 
-    #         df=row['count']-1,
-    #         loc=row['mean'],
-    #         scale=row['std']/np.sqrt(row['count'])
-    #     )
-    
-    # grouped['60%_CI'] = grouped.apply(lambda x: calc_ci(x, 0.60), axis=1)
-    # grouped['80%_CI'] = grouped.apply(lambda x: calc_ci(x, 0.80), axis=1)
-    # grouped['90%_CI'] = grouped.apply(lambda x: calc_ci(x, 0.90), axis=1)
-    # grouped['95%_CI'] = grouped.apply(calc_ci, axis=1)
-    
-    # # 拆分置信区间为上下限
-    # grouped['60%_CI_lower'] = grouped['60%_CI'].apply(lambda x: x[0])
-    # grouped['60%_CI_upper'] = grouped['60%_CI'].apply(lambda x: x[1])
-    # grouped['80%_CI_lower'] = grouped['80%_CI'].apply(lambda x: x[0])
-    # grouped['80%_CI_upper'] = grouped['80%_CI'].apply(lambda x: x[1])
-    # grouped['90%_CI_lower'] = grouped['90%_CI'].apply(lambda x: x[0])
-    # grouped['90%_CI_upper'] = grouped['90%_CI'].apply(lambda x: x[1])
-    # grouped['95%_CI_lower'] = grouped['95%_CI'].apply(lambda x: x[0])
-    # grouped['95%_CI_upper'] = grouped['95%_CI'].apply(lambda x: x[1])
-    
-    # # 删除原始CI列
-    # grouped.drop(['60%_CI', '80%_CI', '90%_CI', '95%_CI'], axis=1, inplace=True)
-    
+    if approximate:
+        if sketches is None:
+            sketches = build_group_sketches(df, '该节点审批工作时长', [group_field1, group_field2])
+        return summarize_sketches(sketches, group_field1, group_field2, confidence_levels)
+
+    # 分组计算计数、均值、标准差
+    groups = df.groupby([group_field1, group_field2])
+    grouped = groups['该节点审批工作时长'].agg(['count', 'mean', 'std']).reset_index()
+
+    # 各组排序一次，读取全部分位数
+    quantiles = grouped_quantiles(
+        df['该节点审批工作时长'].to_numpy(dtype=float),
+        groups.ngroup().fillna(-1).to_numpy(dtype=int),
+        len(grouped),
+        QUANTILES
+    )
+    for q in QUANTILES:
+        grouped[f'{q:.0%}分位'] = quantiles[q]
+
+    if confidence_levels:
+        grouped = add_confidence_intervals(grouped, confidence_levels)
+
     return grouped
 
 # 使用示例
@@ -93,31 +124,60 @@ def analyze_approval_duration(df, group_field1, group_field2):
 # result = analyze_approval_duration(df, "字段1", "字段2")
 # result.to_excel("分析结果.xlsx", index=False)
 
-holiday_df = pd.read_excel(r"C:\Users\zhangbon\Desktop\临时活\1131统计\计算节点合理时长\2025-方太非工作日清单.xlsx", engine='openpyxl')
-holidays = [datetime.strptime(str(date).strip(), '%Y-%m-%d %H:%M:%S').date() for date in holiday_df['日期']]
-
-in_path = r"C:\Users\zhangbon\Desktop\临时活\1131统计\计算节点合理时长\24年数据分析-0603\24年数据分析-0603\Q1-五个一和PBC审批流程(1).xlsx"
-out_path = in_path.replace(".xlsx", "-计算时长.xlsx")
-group_path = in_path.replace(".xlsx", "-结果分析稿.xlsx")
-
-
-df = pd.read_excel(in_path, engine='openpyxl')
-
-
-df['该节点审批工作时长'] = df.apply(
-    lambda row: calculate_work_duration(
-        row['单个节点审批到达时间'], 
-        row['单个节点审批结束时间'], 
-        holidays
-    ), 
-    axis=1
-)
-
-df.to_excel(out_path, index=False)
-print(df.columns)
-grouper = analyze_approval_duration(df, '流程名称', '审批节点名称')
-grouper.to_excel(group_path, index=False)
-print("分析完成")
+def merge_quarter_sketches(sketch_paths, group_field1='流程名称', group_field2='审批节点名称', confidence_levels=None):
+    """
+    合并各季度保存的分组草图，生成全年统计结果，不必重新读取各季度明细
+    :param sketch_paths: 各季度草图文件（USE_SKETCHES 时随季度分析保存）
+    :return: 与 analyze_approval_duration 相同列的DataFrame（分位数为近似值）
+    """
+    sketches = merge_sketch_sets([load_sketches(path) for path in sketch_paths])
+    return summarize_sketches(sketches, group_field1, group_field2, confidence_levels)
+
+def analyze_quarter(in_path):
+    """季度分析：计算工作时长并输出分组统计；USE_SKETCHES 时分位数由草图估计，草图另存供全年合并"""
+    holiday_df = pd.read_excel(HOLIDAY_FILE_PATH, engine='openpyxl')
+    # 与原逻辑一致，只排除非工作日清单中的日期
+    calendar = WorkCalendar.from_frame(holiday_df, '日期', weekmask=ALL_DAYS)
+
+    out_path = in_path.replace(".xlsx", "-计算时长.xlsx")
+    group_path = in_path.replace(".xlsx", "-结果分析稿.xlsx")
+    sketch_path = in_path.replace(".xlsx", SKETCH_SUFFIX)
+
+    df = pd.read_excel(in_path, engine='openpyxl')
+
+    df['该节点审批工作时长'] = calculate_work_durations(
+        parse_timestamps(df['单个节点审批到达时间'], TIME_FORMATS),
+        parse_timestamps(df['单个节点审批结束时间'], TIME_FORMATS),
+        calendar
+    )
+
+    df.to_excel(out_path, index=False)
+    print(df.columns)
+    sketches = None
+    if USE_SKETCHES:
+        sketches = build_group_sketches(df, '该节点审批工作时长', ['流程名称', '审批节点名称'])
+        save_sketches(sketches, sketch_path)
+    grouper = analyze_approval_duration(
+        df, '流程名称', '审批节点名称', CONFIDENCE_LEVELS, approximate=USE_SKETCHES, sketches=sketches
+    )
+    grouper.to_excel(group_path, index=False)
+    print("分析完成")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='审批工作时长分组统计及置信度分析')
+    parser.add_argument('--merge', nargs='+', metavar='草图文件', default=YEAR_SKETCH_PATHS,
+                        help='合并各季度草图文件（*' + SKETCH_SUFFIX + '），输出全年分析结果')
+    parser.add_argument('--output', default=YEAR_RESULT_PATH, help='全年分析结果输出路径')
+    parser.add_argument('--input', default=IN_PATH, help='季度明细Excel')
+    args = parser.parse_args()
+
+    if args.merge:
+        # 合并各季度草图，输出全年分析结果
+        year_result = merge_quarter_sketches(args.merge, confidence_levels=CONFIDENCE_LEVELS)
+        year_result.to_excel(args.output, index=False)
+        print(f"全年分析完成，结果已保存到 {args.output}")
+    else:
+        analyze_quarter(args.input)
 
 
 
@@ -1,71 +1,63 @@
 import datetime
+import math
+import os
+import sys
 
-def calculate_work_hours(start_dt, end_dt):
-    # 计算总时间差（小时）
-    total_hours = (end_dt - start_dt).total_seconds() / 3600
-    
-    # 初始化周末小时数
-    weekend_hours = 0
-    
-    # 生成日期范围（按整天计算）
-    current_date = start_dt.date()
-    end_date = end_dt.date()
-    
-    while current_date <= end_date:
-        # 判断是否为周末
-        if current_date.weekday() >= 5:  # 5=周六，6=周日
-            # 处理开始日期
-            if current_date == start_dt.date():
-                # 计算当天剩余的小时数
-                next_day = current_date + datetime.timedelta(days=1)
-                remaining = datetime.datetime.combine(next_day, datetime.time.min) - start_dt
-                weekend_hours += remaining.total_seconds() / 3600
-            # 处理结束日期
-            elif current_date == end_dt.date():
-                # 计算当天已过的小时数
-                start_of_day = datetime.datetime.combine(current_date, datetime.time.min)
-                passed = end_dt - start_of_day
-                weekend_hours += passed.total_seconds() / 3600
-            # 处理中间完整天数
-            else:
-                weekend_hours += 24
-        current_date += datetime.timedelta(days=1)
-    
-    return total_hours - weekend_hours
+import numpy as np
+import pandas as pd
 
-def calculate_work_days(start_dt, end_dt):
+# 工作日历与审批报告共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '1131审批报告'))
+from work_time_utils import WorkCalendar, OFFICE_SHIFTS
+
+# 默认日历：只排除周末
+DEFAULT_CALENDAR = WorkCalendar()
+# 班次日历：排除周末，只计 08:30-12:00、13:00-17:30
+OFFICE_CALENDAR = WorkCalendar(shifts=OFFICE_SHIFTS)
+
+def calculate_work_hours_array(start_dts, end_dts, calendar=None):
+    """
+    批量计算工作小时数（默认排除周末，传入calendar时按其假期及调休计算）
+    结束早于开始时与原逻辑一致，返回两者相差的总小时数（负数，不剔除周末），时间缺失时为NaN
+    """
+    calendar = calendar or DEFAULT_CALENDAR
+    start = pd.to_datetime(pd.Series(start_dts)).to_numpy()
+    end = pd.to_datetime(pd.Series(end_dts)).to_numpy()
+    elapsed = (end - start) / np.timedelta64(1, 's')
+    return np.where(end < start, elapsed, calendar.work_seconds(start, end)) / 3600
+
+def calculate_office_hours_array(start_dts, end_dts, calendar=None):
+    """
+    批量计算班次内工作小时数（默认排除周末、只计上下班时间，传入带班次和假期的calendar时按其计算）
+    结束早于开始时为反向区间班次内小时数的负数，时间缺失时为NaN
+    """
+    calendar = calendar or OFFICE_CALENDAR
+    forward = calendar.work_seconds(start_dts, end_dts)
+    backward = calendar.work_seconds(end_dts, start_dts)
+    return (forward - backward) / 3600
+
+def calculate_work_days_array(start_dts, end_dts, calendar=None):
+    """
+    批量计算工作日天数差（默认排除周末，传入calendar时按其假期及调休计算）
+    日期缺失时为NaN
+    """
+    calendar = calendar or DEFAULT_CALENDAR
+    return calendar.work_days(start_dts, end_dts)
+
+def calculate_work_hours(start_dt, end_dt, calendar=None):
+    # 计算总时间差（小时）中剔除周末后的工作小时数
+    return float(calculate_work_hours_array([start_dt], [end_dt], calendar)[0])
+
+def calculate_work_days(start_dt, end_dt, calendar=None):
     """
     计算两个日期之间的工作日天数差（排除周末）
-    返回end_dt - start_dt的工作日天数差
+    返回end_dt - start_dt的工作日天数差，任一日期缺失时返回None
     """
-    # 确保输入是日期类型
-    if isinstance(start_dt, datetime.datetime):
-        start_dt = start_dt.date()
-    if isinstance(end_dt, datetime.datetime):
-        end_dt = end_dt.date()
-    
-    # 初始化工作日差计数器
-    day_diff = 0
-    current_date = start_dt
-    
-    # 计算日期差（包含end_dt当天）
-    while current_date < end_dt:
-        if current_date.weekday() < 5:  # 周一到周五
-            day_diff += 1
-        current_date += datetime.timedelta(days=1)
-    
-    # 如果是倒序日期（end_dt < start_dt）
-    if end_dt < start_dt:
-        current_date = end_dt
-        while current_date < start_dt:
-            if current_date.weekday() < 5:
-                day_diff -= 1
-            current_date += datetime.timedelta(days=1)
-    
-    return day_diff
+    days = calculate_work_days_array([start_dt], [end_dt], calendar)[0]
+    return None if math.isnan(days) else int(days)
 
 # 使用示例
 start_time = datetime.datetime(2023, 1, 6, 18, 0)  # 周五18:00
 end_time = datetime.datetime(2023, 1, 9, 9, 0)    # 周一9:00
 print(calculate_work_hours(start_time, end_time))  # 输出15.0
-print(calculate_work_days(start_time, end_time))   # 输出1（周一）
\ No newline at end of file
+print(calculate_work_days(start_time, end_time))   # 输出1（周一）
@@ -1,73 +1,66 @@
 import pandas as pd
+import numpy as np
 import datetime
-from datetime_utils import calculate_work_hours  # 导入之前写的计算函数
-from datetime_utils import calculate_work_days  # 导入之前写的计算函数
+from datetime_utils import calculate_work_hours_array  # 导入之前写的计算函数
+from datetime_utils import calculate_work_days_array  # 导入之前写的计算函数
+
+# 有效天数列：(列名, 开始时间列, 结束时间列)
+DAY_INTERVALS = [
+    ('有效天数-采购&主数据', '创建日期', '流程结束日期'),
+    ('有效天数-采购', '创建日期', '采购审核日期'),
+    ('有效天数-主数据', '采购审核日期', '流程结束日期'),
+    ('有效天数-NPI', '物料创建日期', '创建日期'),
+    ('有效天数-总流程', '物料创建日期', '流程结束日期'),
+]
+
+# 有效小时数列：(列名, 开始时间列, 结束时间列)
+HOUR_INTERVALS = [
+    ('有效小时数-NPI', '物料创建日期', '创建日期'),
+    ('有效小时数-采购', '创建日期', '采购审核日期'),
+    ('有效小时数-主数据', '采购审核日期', '流程结束日期'),
+    ('有效小时数-总流程', '物料创建日期', '流程结束日期'),
+]
+
+def add_interval_columns(df, intervals, calc_func):
+    """把所有区间的开始/结束列拼成一列，一次数组运算后再按区间拆回各列"""
+    starts = np.concatenate([df[start].to_numpy() for _, start, _ in intervals])
+    ends = np.concatenate([df[end].to_numpy() for _, _, end in intervals])
+    values = calc_func(starts, ends).reshape(len(intervals), len(df))
+    for (name, _, _), column in zip(intervals, values):
+        df[name] = column
+    return df
 
 def process_excel_file(input_path, output_path):
     # 读取Excel文件（支持xlsx和xls格式）
     df = pd.read_excel(input_path,sheet_name='流程&批导')
     print("===========",df)
-    
+
     # 转换时间列（使用实际列名）
     df['创建日期'] = pd.to_datetime(df['创建日期'], errors='coerce')
     print("===========",df['创建日期'])
     df['采购审核日期'] = pd.to_datetime(df['采购审核日期'], errors='coerce')
-    
+    df['物料创建日期'] = pd.to_datetime(df['物料创建日期'], errors='coerce')
+
     # 新增流程结束时间列转换（假设存在该列）
     df['流程结束日期'] = pd.to_datetime(df['流程结束日期'], errors='coerce')
-    
-    # 新增有效工时列
-    df['有效天数-采购&主数据'] = df.apply(
-        lambda row: calculate_work_days(row['创建日期'], row['流程结束日期']) ,
-        axis=1
-    )
-    df['有效天数-采购'] = df.apply(
-    lambda row: calculate_work_days(row['创建日期'], row['采购审核日期']) ,
-    axis=1
-    )
-        # 新增有效工时列
-    df['有效天数-主数据'] = df.apply(
-        lambda row: calculate_work_days(row['采购审核日期'], row['流程结束日期']) ,
-        axis=1
-    )
-    df['有效天数-NPI'] = df.apply(
-        lambda row: calculate_work_days(row['物料创建日期'], row['创建日期']) ,
-        axis=1
-    )
-    df['有效天数-总流程'] = df.apply(
-    lambda row: calculate_work_days(row['物料创建日期'], row['流程结束日期']) ,
-    axis=1
-    )
-
-    # 新增有效小时数列
-    df['有效小时数-NPI'] = df.apply(
-        lambda row: calculate_work_hours(row['物料创建日期'], row['创建日期']),
-        axis=1
-    )
-    df['有效小时数-采购'] = df.apply(
-        lambda row: calculate_work_hours(row['创建日期'], row['采购审核日期']),
-        axis=1
-    )
-    df['有效小时数-主数据'] = df.apply(
-        lambda row: calculate_work_hours(row['采购审核日期'], row['流程结束日期']),
-        axis=1
-    )
-    df['有效小时数-总流程'] = df.apply(
-        lambda row: calculate_work_hours(row['物料创建日期'], row['流程结束日期']),
-        axis=1
-    )
 
+    # 先筛选、去重，后面只对保留下来的记录计算时长
     #保留物料创建日期在2024年11月1日到2025年3月31日之间的记录
     df = df[(df['物料创建日期'] >= '2024-11-01') & (df['物料创建日期'] <= '2025-03-31')]
 
     #在同一个物料编码下，只保留创建日期最早的记录
     df = df.sort_values(by=['物料编码', '创建日期']).drop_duplicates(subset=['物料编码'], keep='first')
-    
+    df = df.copy()
+
+    # 新增有效工时列、有效小时数列（各区间合并为一次数组运算）
+    df = add_interval_columns(df, DAY_INTERVALS, calculate_work_days_array)
+    df = add_interval_columns(df, HOUR_INTERVALS, calculate_work_hours_array)
+
     # # 处理空值情况
     # if df['有效时长'].isnull().any():
     #     print("警告：存在无法解析的时间格式，已自动替换为0")
     #     df['有效时长'].fillna(0, inplace=True)
-    
+
     # 保存结果到新文件
     df.to_excel(output_path, index=False)
     print(f"处理完成，结果已保存至：{output_path}")
@@ -76,5 +69,5 @@ def process_excel_file(input_path, output_path):
 if __name__ == "__main__":
     input_file = r"C:\Users\zhangbon\Desktop\流程记录.XLSX"  # 原始Excel路径
     output_file = r"C:\Users\zhangbon\Desktop\流程记录-总计.xlsx"  # 输出路径
-    
-    process_excel_file(input_file, output_file)
\ No newline at end of file
+
+    process_excel_file(input_file, output_file)
@@ -57,6 +57,16 @@ Excel数据核对工具 (Part 2/3)
 
 from datetime import datetime
 import re
+import sys
+
+# 时间列批量解析与审批报告共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '1131审批报告'))
+from time_parse_utils import parse_single
+
+DATE_FORMATS = (
+    '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y',
+    '%Y%m%d', '%Y.%m.%d', '%d-%b-%y'
+)
 
 
 def normalize_date(date_str):
@@ -64,20 +74,23 @@ def normalize_date(date_str):
     if pd.isna(date_str) or str(date_str).strip() in ['', '<空值>']:
         return None
 
-    formats = [
-        '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y',
-        '%Y%m%d', '%Y.%m.%d', '%d-%b-%y'
-    ]
-
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(str(date_str).strip(), fmt)
-            return dt.date().isoformat()  # 统一转为YYYY-MM-DD格式
-        except ValueError:
-            continue
+    dt = parse_single(str(date_str).strip(), DATE_FORMATS)
+    if dt is not None:
+        return dt.date().isoformat()  # 统一转为YYYY-MM-DD格式
     return str(date_str).strip()  # 无法解析时返回原始值
 
 
+def normalize_date_column(values):
+    """整列日期标准化：同一取值只调用一次 normalize_date，结果与逐个调用一致"""
+    result = pd.Series(None, index=values.index, dtype=object)
+    present = values.notna()
+    # normalize_date 按 str() 后的文本处理，按文本去重
+    codes, uniques = pd.factorize(values[present].astype(str))
+    normalized = pd.Series([normalize_date(text) for text in uniques], dtype=object)
+    result[present] = normalized.to_numpy()[codes]
+    return result
+
+
 def normalize_phone(phone_str):
     """电话号码归一化处理"""
     if pd.isna(phone_str) or str(phone_str).strip() in ['', '<空值>']:
@@ -139,6 +152,11 @@ def compare_datasets(source_df, target_df, key_columns):
     # 获取共同字段（排除主键列）
     common_columns = list(set(source_df.columns) & set(target_df.columns) - {'_composite_key'})
 
+    # 日期字段整列预先标准化，逐行比对时直接取值
+    date_columns = [col for col in common_columns if 'date' in col.lower() or '日期' in col]
+    source_dates = {col: normalize_date_column(source_df[col]) for col in date_columns}
+    target_dates = {col: normalize_date_column(target_df[col]) for col in date_columns}
+
     results = []
 
     # 处理仅存在于源数据的主键
@@ -180,9 +198,9 @@ def compare_datasets(source_df, target_df, key_columns):
             normalized_tgt = tgt_val
 
             # 日期字段处理（列名包含date/日期）
-            if 'date' in col.lower() or '日期' in col:
-                normalized_src = normalize_date(src_val)
-                normalized_tgt = normalize_date(tgt_val)
+            if col in source_dates:
+                normalized_src = source_dates[col][src_row.name]
+                normalized_tgt = target_dates[col][tgt_row.name]
 
             # 电话字段处理（列名包含phone/电话）
             elif 'phone' in col.lower() or '电话' in col or '手机号' in col:
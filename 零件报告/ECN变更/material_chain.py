@@ -0,0 +1,80 @@
+"""
+物料变更链计算公共模块
+
+供 依据ECN变更单计算物料变更次数.py 及其使用最原始子项物料的版本使用。
+变更关系为 新物料 -> 旧物料，每个物料沿旧物料方向只走一次（记忆化），整体 O(n)：
+- 最原始子项物料：沿旧物料一直走到底的物料；
+- 变更次数：经过该物料的最长变更链的长度（从最原始物料到最新物料的变更次数），
+  单条链上每个物料都等于整条链的长度；一个旧物料拆分为多个新物料（分支）时，
+  各分支分别计算，共同的上游物料取最长的分支；
+- 同一新物料在多行中对应不同旧物料（合并）时以最后一行为准，并记录下来；
+- 循环变更链在编码最小的物料处断开（该物料视为最原始物料），并记录下来。
+"""
+
+
+def resolve_material_chains(material_links):
+    """
+    计算物料变更链
+    :param material_links: 按行顺序的 (新物料, 旧物料) 列表
+    :return: {'chain_lengths': {物料: 变更次数}, 'original_materials': {物料: 最原始物料},
+              'cycles': [[循环中的物料, ...]], 'branches': {旧物料: [新物料, ...]},
+              'merges': {新物料: [旧物料, ...]}}
+    """
+    # 新物料 -> 旧物料，后出现的行覆盖前面的行
+    parents = {}
+    merges = {}
+    for new, old in material_links:
+        if new in parents and parents[new] != old:
+            olds = merges.setdefault(new, [parents[new]])
+            if old not in olds:
+                olds.append(old)
+        parents[new] = old
+
+    depths = {}
+    roots = {}
+    # 先旧后新的处理顺序，计算下游最长链时倒序使用
+    order = []
+    cycles = []
+    for material in list(parents):
+        path = []
+        position = {}
+        current = material
+        while current not in depths:
+            if current not in parents:
+                depths[current] = 0
+                roots[current] = current
+                order.append(current)
+                break
+            if current in position:
+                # 循环：在编码最小的物料处断开后重新走
+                cycle = path[position[current]:]
+                start = cycle.index(min(cycle, key=str))
+                cycles.append(cycle[start:] + cycle[:start])
+                del parents[cycle[start]]
+                path, position, current = [], {}, material
+                continue
+            position[current] = len(path)
+            path.append(current)
+            current = parents[current]
+        for node in reversed(path):
+            parent = parents[node]
+            depths[node] = depths[parent] + 1
+            roots[node] = roots[parent]
+            order.append(node)
+
+    # 下游最长链长度：新物料先于旧物料处理
+    heights = dict.fromkeys(order, 0)
+    branches = {}
+    for node in reversed(order):
+        if node in parents:
+            parent = parents[node]
+            heights[parent] = max(heights[parent], heights[node] + 1)
+            branches.setdefault(parent, []).append(node)
+
+    return {
+        'chain_lengths': {node: depths[node] + heights[node] for node in order},
+        'original_materials': roots,
+        'cycles': cycles,
+        'branches': {old: news[::-1] for old, news in branches.items() if len(news) > 1},
+        'merges': merges,
+    }
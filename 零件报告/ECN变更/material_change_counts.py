@@ -0,0 +1,279 @@
+"""
+依据ECN变更单计算物料变更次数（公共实现）
+
+依据ECN变更单计算物料变更次数.py（按子项物料统计）与
+依据ECN变更单计算物料变更次数(使用最原始子项物料).py 共用本模块，两者的差异由配置决定：
+读取的sheet、用于计算变更次数的计分规则、高变更物料按哪一列去重、均值列名及输出文件名。
+
+变更链计算见 material_chain.py；统计阶段只取需要的几列，父项、产品组两级汇总各算一次，
+再按索引一次性对齐回明细，不再逐步 merge 越来越宽的整表。
+"""
+
+import numpy as np
+import pandas as pd
+
+from material_chain import resolve_material_chains
+from run_monitor import RunMonitor, VERBOSITY, TRACK_MEMORY
+
+# 按子项物料统计
+CHILD_MATERIAL_CONFIG = {
+    'sheet_name': 'Sheet4',
+    # 计分规则：simple 未变更记1、变更记0.5；chain_end 在此基础上，多次变更的链条中间环节记1
+    'weighting': 'simple',
+    # 高变更子项物料按哪一列去重
+    'high_change_column': '子项物料',
+    # 高变更子项物料均值的列名，如 ADCP前变更均值
+    'material_mean_label': '变更均值',
+    # 是否输出变更次数均值（ADCP前变更次数均值 等）
+    'count_means': False,
+    'input_suffix': '.XLSX',
+    'output_suffix': '_带变更次数.xlsx',
+}
+
+# 按最原始子项物料统计
+ORIGINAL_MATERIAL_CONFIG = {
+    'sheet_name': 'Sheet1',
+    'weighting': 'chain_end',
+    'high_change_column': '最原始子项物料',
+    'material_mean_label': '变更物料均值',
+    'count_means': True,
+    'input_suffix': '.xlsx',
+    'output_suffix': '_带变更次数-使用最终子项物料.xlsx',
+}
+
+ADCP_LABELS = ['ADCP前', 'ADCP后']
+# 父项变更情况种类（按名称排序，与汇总列的顺序一致）
+CHANGE_KINDS = ['ADCP前后均变更', '仅ADCP前变更', '仅ADCP后变更']
+
+
+def build_predecessor_index(df):
+    """
+    按 (更改号至, 父项物料编码) 一次性建立旧物料行索引，代替逐行全表筛选
+    每个键只需保留按行顺序的第一个子项物料，及第一个与之不同的子项物料：
+    当前物料与第一个相同时取第二个，结果与"第一条子项物料不同的匹配行"一致
+    :param df: ECN变更记录
+    :return: {(更改号至, 父项物料编码): [子项物料, ...]}，每个键最多两个
+    """
+    candidates = df.dropna(subset=['更改号至', '父项物料编码']).drop_duplicates(['更改号至', '父项物料编码', '子项物料'])
+    predecessor_index = {}
+    for change_to, parent, material in zip(candidates['更改号至'], candidates['父项物料编码'], candidates['子项物料']):
+        materials = predecessor_index.setdefault((change_to, parent), [])
+        if len(materials) < 2:
+            materials.append(material)
+    return predecessor_index
+
+
+def find_material_links(df, monitor):
+    """
+    逐行查找变更后物料对应的旧物料
+    :param monitor: RunMonitor，输出进度及逐条明细
+    :return: 按行顺序的 [(新物料, 旧物料)]
+    """
+    # 物料变更关系，按行顺序 [(新物料, 旧物料)]
+    material_links = []
+    # 旧物料行索引 {(更改号至, 父项物料编码): [子项物料, ...]}
+    predecessor_index = build_predecessor_index(df)
+
+    total = len(df)
+    rows = zip(df['子项物料'], df['更改号自'], df['父项物料编码'])
+    for done, (material, change_from, parent) in enumerate(rows, 1):
+        # 获取当前行的物料编码
+        current_material = str(material).strip()
+
+        # 判断是否是变更后的物料（根据更改号自的长度）
+        if pd.notna(change_from) and len(str(change_from)) >= 5:
+            # 查找对应的旧物料行（同时匹配更改号至和父项物料）
+            old_material_rows = [
+                candidate for candidate in predecessor_index.get((change_from, parent), [])
+                if candidate != current_material  # 确保不是同一个物料
+            ] if pd.notna(parent) else []
+
+            if old_material_rows:
+                old_material = str(old_material_rows[0]).strip()
+                # 确保新旧物料不同
+                if old_material != current_material:
+                    material_links.append((current_material, old_material))
+                    monitor.detail(f"建立变更关系: {old_material} -> {current_material}")
+            else:
+                monitor.count('找不到匹配旧物料的行')
+                monitor.detail(f"警告: 找不到匹配的旧物料行 for {current_material}")
+        monitor.progress(done, total, '查找变更关系')
+    return material_links
+
+
+def change_weights(df, weighting):
+    """
+    用于计算变更次数的计分
+    :param weighting: simple 或 chain_end，见 CHILD_MATERIAL_CONFIG
+    """
+    unchanged = np.where(df['变更次数'] == 0, 1, 0.5)
+    if weighting == 'simple':
+        return unchanged
+    # 多次变更且更改号自、更改号至都有效的行：更改号自不在全部更改号至中、或更改号至不在全部更改号自中（链条两端）记0.5，否则记1；
+    # 其余行未变更记1，变更记0.5。isin 对全部更改号建一次哈希集合，每行查找为O(1)
+    multi_change = (
+        (df['变更次数'] > 1) &
+        (df['更改号自'].astype(str).str.len() > 5) &
+        (df['更改号至'].astype(str).str.len() > 5)
+    )
+    chain_end = ~df['更改号自'].isin(df['更改号至'].dropna()) | ~df['更改号至'].isin(df['更改号自'].dropna())
+    return np.where(multi_change, np.where(chain_end, 0.5, 1), unchanged)
+
+
+def adcp_change_sums(stats, key):
+    """按 key 及ADCP前后汇总用于计算变更次数，返回 ADCP前、ADCP后两列，空值补0"""
+    sums = stats.groupby([key, '是否在ADCP前'])['用于计算变更次数'].sum().unstack()
+    return sums.reindex(columns=ADCP_LABELS).fillna(0)
+
+
+def parent_statistics(stats):
+    """父项物料编码级：ADCP前/后变更次数、总变更次数、变更情况种类"""
+    parent_stats = adcp_change_sums(stats, '父项物料编码')
+    parent_stats.columns = ['父项ADCP前变更次数', '父项ADCP后变更次数']
+    before = parent_stats['父项ADCP前变更次数']
+    after = parent_stats['父项ADCP后变更次数']
+    parent_stats['父项总变更次数'] = before + after
+    parent_stats['变更情况种类'] = np.select(
+        [(before > 0) & (after > 0), after > 0, before > 0],
+        ['ADCP前后均变更', '仅ADCP后变更', '仅ADCP前变更'],
+        '无变更'
+    )
+    return parent_stats
+
+
+def group_statistics(stats, parent_stats, config):
+    """产品组描述级：ADCP前/后变更次数、父级物料数、各变更情况种类的父项数、高变更子项物料数及均值"""
+    group_stats = adcp_change_sums(stats, '产品组描述')
+    group_stats.columns = ['ADCP前变更次数', 'ADCP后变更次数']
+    group_stats['总变更次数'] = group_stats['ADCP前变更次数'] + group_stats['ADCP后变更次数']
+    group_stats['产品组父级物料数'] = stats.groupby('产品组描述')['父项物料编码'].nunique()
+
+    # 每个产品组下不同变更情况种类的父级物料去重计数
+    change_kind = stats['父项物料编码'].map(parent_stats['变更情况种类']).rename('变更情况种类')
+    kind_counts = stats['父项物料编码'].groupby([stats['产品组描述'], change_kind]).nunique().unstack()
+    kind_counts = kind_counts.reindex(columns=CHANGE_KINDS).fillna(0).astype(int)
+    kind_counts.columns = [f'{kind}父项物料数（产品组汇总）' for kind in kind_counts.columns]
+    group_stats = group_stats.join(kind_counts)
+
+    # 变更次数≥2的子项物料去重计数（全部、ADCP前、ADCP后）
+    high_change = stats[stats['变更次数'] >= 2]
+    material_column = config['high_change_column']
+    for name, subset in [
+        ('产品组高变更子项物料数', high_change),
+        ('ADCP前高变更子项物料数', high_change[high_change['是否在ADCP前'] == 'ADCP前']),
+        ('ADCP后高变更子项物料数', high_change[high_change['是否在ADCP前'] == 'ADCP后']),
+    ]:
+        counts = subset.groupby('产品组描述')[material_column].nunique()
+        group_stats[name] = counts.reindex(group_stats.index).fillna(0).astype(int)
+
+    # 均值：分母为对应变更情况的父项物料数（整体为产品组父级物料数）
+    before_parents = (group_stats['ADCP前后均变更父项物料数（产品组汇总）'] +
+                      group_stats['仅ADCP前变更父项物料数（产品组汇总）']).replace([np.inf, -np.inf], 0).fillna(0)
+    after_parents = (group_stats['ADCP前后均变更父项物料数（产品组汇总）'] +
+                     group_stats['仅ADCP后变更父项物料数（产品组汇总）']).replace([np.inf, -np.inf], 0).fillna(0)
+    all_parents = group_stats['产品组父级物料数'].replace([np.inf, -np.inf], 0).fillna(0)
+    label = config['material_mean_label']
+    group_stats[f'ADCP前{label}'] = group_stats['ADCP前高变更子项物料数'] / before_parents
+    group_stats[f'ADCP后{label}'] = group_stats['ADCP后高变更子项物料数'] / after_parents
+    group_stats[f'整体{label}'] = group_stats['产品组高变更子项物料数'] / all_parents
+    if config['count_means']:
+        group_stats['ADCP前变更次数均值'] = group_stats['ADCP前变更次数'] / before_parents
+        group_stats['ADCP后变更次数均值'] = group_stats['ADCP后变更次数'] / after_parents
+        group_stats['整体变更次数均值'] = group_stats['总变更次数'] / all_parents
+    return group_stats
+
+
+def change_statistics(df, config):
+    """
+    统计阶段：从窄表计算父项、产品组两级汇总，按索引对齐回明细
+    :param df: 已含 变更次数、最原始子项物料、是否在ADCP前、用于计算变更次数 的明细
+    :param config: CHILD_MATERIAL_CONFIG 或 ORIGINAL_MATERIAL_CONFIG
+    :return: 与 df 行对齐的汇总列
+    """
+    has_group = '产品组描述' in df.columns
+    columns = ['父项物料编码', '是否在ADCP前', '用于计算变更次数', '变更次数', config['high_change_column']]
+    if has_group:
+        columns.append('产品组描述')
+    stats = df[columns]
+
+    parent_stats = parent_statistics(stats)
+    parent_rows = parent_stats.reindex(stats['父项物料编码']).set_axis(df.index)
+    if not has_group:
+        print("警告: 缺少'产品组描述'列，无法计算产品组汇总")
+        return parent_rows
+
+    group_stats = group_statistics(stats, parent_stats, config)
+    group_rows = group_stats.reindex(stats['产品组描述']).set_axis(df.index)
+    # 没有产品组的行，高变更子项物料数记0
+    high_columns = ['产品组高变更子项物料数', 'ADCP前高变更子项物料数', 'ADCP后高变更子项物料数']
+    group_rows[high_columns] = group_rows[high_columns].fillna(0).astype(int)
+
+    # 列顺序：产品组变更次数及父级物料数、父项汇总、产品组其余汇总
+    leading = ['ADCP前变更次数', 'ADCP后变更次数', '总变更次数', '产品组父级物料数']
+    return pd.concat([group_rows[leading], parent_rows, group_rows.drop(columns=leading)], axis=1)
+
+
+def count_material_changes(file_path, config=ORIGINAL_MATERIAL_CONFIG, sheet_name=None,
+                           verbosity=VERBOSITY, track_memory=TRACK_MEMORY):
+    """
+    计算物料变更次数及各级汇总，结果另存为Excel，运行摘要写在结果文件旁边
+    :param file_path: ECN变更记录Excel路径
+    :param config: CHILD_MATERIAL_CONFIG 或 ORIGINAL_MATERIAL_CONFIG
+    :param sheet_name: 默认取配置中的sheet
+    :param verbosity: 0 只输出警告，1 输出阶段、行数和进度，2 另输出整表及逐条变更关系
+    :param track_memory: 是否记录各阶段内存峰值
+    :return: 带变更次数的明细
+    """
+    with RunMonitor('依据ECN变更单计算物料变更次数', verbosity, track_memory) as monitor:
+        with monitor.stage('读取Excel', track_memory=False):
+            df = pd.read_excel(file_path, sheet_name=sheet_name or config['sheet_name'])
+        monitor.log(f"读取 {len(df)} 行，列: {list(df.columns)}")
+        monitor.detail(df)
+
+        with monitor.stage('剔除无效研发ECN'):
+            # 剔除研发ECN字段为空或长度不足的行
+            valid = df['研发ECN'].apply(lambda x: len(str(x).strip()) >= 5)
+            monitor.rows('剔除研发ECN无效的行', len(df), int(valid.sum()))
+            df = df[valid].reset_index(drop=True)  # 重置索引并丢弃旧索引
+
+        with monitor.stage('查找变更关系'):
+            material_links = find_material_links(df, monitor)
+        monitor.count('变更关系', len(material_links))
+
+        with monitor.stage('计算变更链'):
+            # 计算每个物料的完整变更链长度，并记录每个物料的最原始版本
+            chain_result = resolve_material_chains(material_links)
+        final_chains = chain_result['chain_lengths']
+        original_materials = chain_result['original_materials']
+        for cycle in chain_result['cycles']:
+            monitor.warn(f"警告: 发现循环变更链，已在 {cycle[0]} 处断开: {' <- '.join(cycle)}")
+        monitor.count('循环变更链', len(chain_result['cycles']))
+        if chain_result['branches']:
+            monitor.log(f"注意: {len(chain_result['branches'])} 个旧物料变更为多个新物料，共同的上游物料按最长分支计算变更次数")
+            monitor.count('变更为多个新物料的旧物料', len(chain_result['branches']))
+        if chain_result['merges']:
+            monitor.log(f"注意: {len(chain_result['merges'])} 个新物料对应多个旧物料，以最后一行的变更关系为准")
+            monitor.count('对应多个旧物料的新物料', len(chain_result['merges']))
+
+        with monitor.stage('计算变更次数'):
+            # 将变更次数映射回原始DataFrame
+            materials = df['子项物料'].map(lambda x: str(x).strip())
+            df['变更次数'] = materials.map(lambda x: final_chains.get(x, 0))
+            # 新增最原始子项物料列
+            df['最原始子项物料'] = materials.map(lambda x: original_materials.get(x, x))
+            # 新增是否在ADCP前列
+            df['是否在ADCP前'] = np.where(df['研发ECN'].astype(str).str[:3] == 'TFI', 'ADCP前', 'ADCP后')
+            # 新增用于计算变更次数列
+            df['用于计算变更次数'] = change_weights(df, config['weighting'])
+
+        with monitor.stage('汇总统计'):
+            # 父项、产品组汇总，一次性拼接到明细
+            df = pd.concat([df, change_statistics(df, config)], axis=1)
+
+        # 保存带有变更次数的新Excel文件
+        output_file = file_path.replace(config['input_suffix'], config['output_suffix'])
+        with monitor.stage('导出Excel', track_memory=False):
+            df.to_excel(output_file, index=False)
+        monitor.write_summary(output_file)
+
+    return df
@@ -0,0 +1,152 @@
+"""
+ECN数据处理的运行监控
+
+供 material_change_counts.py 等批处理脚本使用，代替逐行 print：
+- 命名阶段的耗时及内存峰值（tracemalloc，默认关闭，Excel读写阶段不记录）；
+- 每一步过滤前后的行数；
+- 按时间间隔节流的进度输出；
+- 输出详细程度：0 只输出警告，1 另输出阶段、行数和进度，2 另输出逐条明细；
+运行结束后把各阶段耗时、内存峰值、行数和计数写成JSON，放在输出文件旁边。
+用 with RunMonitor(...) as monitor 包住整个运行，中途出错时也会停止 tracemalloc。
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# 默认输出详细程度：0 安静，1 常规，2 详细
+VERBOSITY = 1
+# 是否记录各阶段内存峰值；tracemalloc 会明显拖慢大量创建Python对象的代码，默认关闭，
+# 排查内存时设置环境变量 ECN_TRACK_MEMORY=1 打开
+TRACK_MEMORY = os.environ.get('ECN_TRACK_MEMORY', '') == '1'
+# 进度输出的最小间隔（秒）
+PROGRESS_INTERVAL = 5.0
+# 运行摘要文件名后缀，与输出文件同名同目录
+SUMMARY_SUFFIX = '_运行摘要.json'
+
+
+class RunMonitor:
+    """
+    运行监控
+    :param name: 运行名称，写入运行摘要
+    :param verbosity: 0 安静，1 常规，2 详细
+    :param track_memory: 是否记录各阶段内存峰值
+    :param progress_interval: 进度输出的最小间隔（秒）
+    """
+
+    def __init__(self, name, verbosity=VERBOSITY, track_memory=TRACK_MEMORY, progress_interval=PROGRESS_INTERVAL):
+        self.name = name
+        self.verbosity = verbosity
+        self.track_memory = track_memory
+        self.progress_interval = progress_interval
+        # [{'stage', 'seconds', 'peak_mb'}]
+        self.stages = []
+        # [{'filter', 'rows_in', 'rows_out'}]
+        self.filters = []
+        # {名称: 次数}，如找不到旧物料的行数
+        self.counts = {}
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._last_progress = self._started
+        # 已在运行的 tracemalloc（如外层基准测试）不由本监控停止
+        self._owns_tracing = track_memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 中途出错时也停止本监控启动的 tracemalloc，不影响调用方后续代码的速度
+        self.close()
+        return False
+
+    def close(self):
+        """停止本监控启动的 tracemalloc，可重复调用"""
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def warn(self, message):
+        """警告，总是输出"""
+        print(message)
+
+    def log(self, message):
+        """常规信息：阶段、行数等"""
+        if self.verbosity >= 1:
+            print(message)
+
+    def detail(self, message):
+        """逐条明细，只在详细模式下输出"""
+        if self.verbosity >= 2:
+            print(message)
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def rows(self, name, rows_in, rows_out):
+        """记录一步过滤前后的行数"""
+        self.filters.append({'filter': name, 'rows_in': int(rows_in), 'rows_out': int(rows_out)})
+        self.log(f"{name}: {rows_in} -> {rows_out} 行（剔除 {rows_in - rows_out} 行）")
+
+    def progress(self, done, total, label):
+        """进度，距上次输出不足 progress_interval 秒时不输出；最后一条总是输出"""
+        if self.verbosity < 1:
+            return
+        now = time.perf_counter()
+        if now - self._last_progress >= self.progress_interval or done == total:
+            self._last_progress = now
+            print(f"{label}: {done}/{total}（{done / total:.0%}）" if total else f"{label}: {done}")
+
+    @contextmanager
+    def stage(self, name, track_memory=True):
+        """
+        命名阶段，记录耗时及该阶段内新增的内存峰值（MB），阶段不嵌套使用
+        :param track_memory: Excel读写等大量创建Python对象的阶段传 False，暂停 tracemalloc 以免成倍拖慢
+        """
+        self.log(f"[{name}] 开始")
+        track = self.track_memory and track_memory
+        paused = self.track_memory and not track_memory and self._owns_tracing
+        if paused:
+            tracemalloc.stop()
+        if track:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak_mb = None
+            if track:
+                peak_mb = round((tracemalloc.get_traced_memory()[1] - base) / 1024 ** 2, 2)
+            if paused:
+                tracemalloc.start()
+            self.stages.append({'stage': name, 'seconds': round(seconds, 4), 'peak_mb': peak_mb})
+            memory = '' if peak_mb is None else f"，内存峰值 {peak_mb} MB"
+            self.log(f"[{name}] 完成，耗时 {seconds:.2f} 秒{memory}")
+
+    def write_summary(self, output_file):
+        """
+        将运行摘要写到输出文件旁边
+        :param output_file: 输出文件路径，摘要为同目录下的 <文件名>_运行摘要.json
+        :return: 摘要文件路径
+        """
+        self.close()
+        summary = {
+            'name': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - self._started, 4),
+            'output_file': output_file,
+            'stages': self.stages,
+            'filters': self.filters,
+            'counts': self.counts,
+        }
+        summary_path = os.path.splitext(output_file)[0] + SUMMARY_SUFFIX
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        self.log(f"运行摘要已保存到: {summary_path}，总耗时 {summary['total_seconds']:.2f} 秒")
+        return summary_path
@@ -1,8 +1,25 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
 
 ###准备工作有这几个文档1、整机特殊采购类.XLSX 2、物料生命周期-产品线-组.XLSX 3、仅ecn记录.XLSX 4、筛后整机BOM清单.xlsx
 
+# ECN记录（制造ECN号与研发ECN的对照）
+ECN_RECORD_PATH = r"D:\000物料报表\202504\物料变更\仅ecn记录.XLSX"
+# 合并后的BOM输出路径
+MERGED_BOM_PATH = r"C:\Users\zhangbon\Desktop\常用物料信息表\筛后全整机BOM.xlsx"
+# BOM只保留前20列（另加研发ECN列）
+BOM_COLUMN_COUNT = 20
+# 并行读取BOM的进程数，None 时取文件数与CPU核数的较小值
+BOM_WORKERS = None
+# 解析为空值的文本，与 pd.read_excel 的默认规则相同；解析BOM时显式使用这组文本，预筛选与解析口径一致
+NA_TEXT_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
 
 # 处理第一个Excel文件
 def process_first_excel(file_path):
@@ -20,53 +37,104 @@ def process_second_excel(file_path):
     filtered_df = df[(df['产品生命周期状态'].isin(valid_status))&(df["国内/海外"]==20)]
     return filtered_df
 
-def merge_bom_files(bom_files):
+def ecn_key(value):
+    """ECN号统一为字符串用于预筛选，整数值的浮点数按整数处理（Excel中的数字ECN号可能读成浮点数）"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def convert_cell(value):
+    """与 pd.read_excel（openpyxl）相同的单元格转换：空单元格为空字符串，整数值的数字转为整数"""
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        integer = int(value)
+        return integer if integer == value else float(value)
+    return value
+
+def load_bom_file(file_path, ecn_list, ecn_mapping):
+    """
+    读取一个BOM文件并筛选ECN相关记录（在子进程中执行）
+    只解析前 BOM_COLUMN_COUNT 列及更改号自/至，逐行读取时先按ECN号预筛选，
+    未被ECN引用的行不转换、不进入DataFrame；保留的行按 pd.read_excel 的规则解析后再做一次精确筛选
+    Args:
+        file_path: BOM文件路径
+        ecn_list: 制造ECN号列表
+        ecn_mapping: 制造ECN号与研发ECN的对照关系字典
+    Returns:
+        筛选后的DataFrame（前 BOM_COLUMN_COUNT 列和研发ECN列），索引为原表中的行号
+    """
+    ecn_keys = {ecn_key(ecn) for ecn in ecn_list if pd.notna(ecn)}
+    # ECN列表中有空值时，isin 会把空的更改号（含解析为空值的 nan、NULL 等文本）也算作匹配
+    if any(pd.isna(ecn) for ecn in ecn_list):
+        ecn_keys.update(NA_TEXT_VALUES)
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows))
+        from_position = header.index('更改号自')
+        to_position = header.index('更改号至')
+        positions = sorted(set(range(min(BOM_COLUMN_COUNT, len(header)))) | {from_position, to_position})
+
+        data = [[convert_cell(header[i]) for i in positions]]
+        index = []
+        for row_number, row in enumerate(rows):
+            change_from = row[from_position] if from_position < len(row) else None
+            change_to = row[to_position] if to_position < len(row) else None
+            if ecn_key(change_from) in ecn_keys or ecn_key(change_to) in ecn_keys:
+                data.append([convert_cell(row[i]) if i < len(row) else "" for i in positions])
+                index.append(row_number)
+    finally:
+        workbook.close()
+
+    df = TextParser(data, header=0, skip_blank_lines=False, keep_default_na=False, na_values=NA_TEXT_VALUES).read()
+    df.index = index
+    # 精确筛选，口径与原先读取整表后的筛选一致
+    filtered = df[(df['更改号自'].isin(ecn_list)) | (df['更改号至'].isin(ecn_list))].copy()
+
+    # 添加研发ECN匹配逻辑：更改号至有效时取更改号至，否则更改号自有效时取更改号自
+    from_valid = filtered['更改号自'].astype(str).str.len() > 5
+    to_valid = filtered['更改号至'].astype(str).str.len() > 5
+    change_number = filtered['更改号至'].where(to_valid, filtered['更改号自'])
+    filtered['研发ECN'] = change_number.map(ecn_mapping).where(from_valid | to_valid, None)
+    # 保留前20列和新添加的研发ECN列
+    return filtered.iloc[:, list(range(min(BOM_COLUMN_COUNT, len(header)))) + [len(filtered.columns) - 1]]
+
+def merge_bom_files(bom_files, ecn_file=ECN_RECORD_PATH, output_path=MERGED_BOM_PATH, max_workers=BOM_WORKERS):
     """
-    合并所有BOM文件，先筛选再合并
+    合并所有BOM文件，先筛选再合并；各BOM文件在子进程中并行读取，读取时即剔除未被ECN引用的行
     Args:
         bom_files: BOM文件路径列表
+        ecn_file: ECN记录路径
+        output_path: 合并结果输出路径
+        max_workers: 并行进程数
     Returns:
         合并后的DataFrame
     """
     # 读取ECN记录
-    ecn_df = pd.read_excel(r"D:\000物料报表\202504\物料变更\仅ecn记录.XLSX")
+    ecn_df = pd.read_excel(ecn_file)
     ecn_list = ecn_df['制造ECN号'].tolist()
     
     # 新增制造ECN号和研发ECN的对照关系字典
     ecn_mapping = dict(zip(ecn_df['制造ECN号'], ecn_df['研发ECN']))
     
     frames = []
-    for file in bom_files:
-        try:
-            df = pd.read_excel(file)
-            # 先筛选当前BOM文件中符合ECN条件的记录
-            filtered = df[
-                (df['更改号自'].isin(ecn_list)) |
-                (df['更改号至'].isin(ecn_list))
-            ]
-            
-            # 添加研发ECN匹配逻辑
-            def match_rd_ecn(row):
-                if len(str(row['更改号自'])) > 5 and len(str(row['更改号至'])) > 5:
-                    return ecn_mapping.get(row['更改号至'], None)
-                elif len(str(row['更改号自'])) > 5:
-                    return ecn_mapping.get(row['更改号自'], None)
-                elif len(str(row['更改号至'])) > 5:
-                    return ecn_mapping.get(row['更改号至'], None)
-                return None
-            
-            filtered['研发ECN'] = filtered.apply(match_rd_ecn, axis=1)
-            # 保留前20列和新添加的研发ECN列
-            frames.append(filtered.iloc[:, list(range(20)) + [len(filtered.columns)-1]])  # 保留前20列
-            
-        except Exception as e:
-            print(f"警告：处理文件 {file} 时出错 - {str(e)}")
+    max_workers = max_workers or min(len(bom_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(load_bom_file, file, ecn_list, ecn_mapping) for file in bom_files]
+        for file, future in zip(bom_files, futures):
+            try:
+                frames.append(future.result())
+            except Exception as e:
+                print(f"警告：处理文件 {file} 时出错 - {str(e)}")
     
     if not frames:
         raise ValueError("没有有效的BOM文件可合并")
         
     merged = pd.concat(frames)
-    merged.to_excel(r"C:\Users\zhangbon\Desktop\常用物料信息表\筛后全整机BOM.xlsx", index=False)
+    merged.to_excel(output_path, index=False)
     return merged
 
 def filter_by_ecn(merged_bom):